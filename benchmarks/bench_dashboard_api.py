@@ -0,0 +1,185 @@
+"""Dashboard API latency against a large transaction table.
+
+Run from the project root:
+
+    python benchmarks/bench_dashboard_api.py [rows]
+
+Seeds a temporary SQLite database with ``rows`` transactions (default
+1,000,000) spread over 100 users and three years, then requests pages
+through Flask's test client and reports p50/p99 latency and response size.
+The unpaginated endpoint is timed on a few requests only, since each one
+serializes the whole table. Revalidated requests (If-None-Match) show the
+cost of a 304 answered from the version stamp. Exports are timed with their peak Python heap
+allocation, which stays flat for the streaming endpoint.
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+
+TMP = tempfile.TemporaryDirectory()
+DB_PATH = os.path.join(TMP.name, 'dashboard.db')
+# Must be set before the app module reads the configuration
+Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{DB_PATH}'
+
+from flask import jsonify
+
+from src.dashboard.app import app, init_db, Transaction
+
+USERS = 100
+CATEGORIES = ['food', 'housing', 'transportation', 'utilities', 'entertainment']
+
+
+def seed(rows):
+    with app.app_context():
+        init_db()
+    rng = random.Random(42)
+    now = datetime(2024, 6, 15)
+    conn = sqlite3.connect(DB_PATH)
+    conn.executemany('INSERT INTO user (id, username) VALUES (?, ?)',
+                     [(user_id, f'user{user_id}') for user_id in range(1, USERS + 1)])
+
+    def rows_iter():
+        for _ in range(rows):
+            is_income = rng.random() < 0.1
+            yield (
+                rng.randint(10000, 5000000),
+                'salary' if is_income else rng.choice(CATEGORIES),
+                'income' if is_income else 'expense',
+                None,
+                # SQLAlchemy's DateTime storage format for SQLite
+                (now - timedelta(seconds=rng.randint(0, 3 * 365 * 86400))).strftime('%Y-%m-%d %H:%M:%S.%f'),
+                rng.randint(1, USERS)
+            )
+
+    conn.executemany('INSERT INTO "transaction" (amount, category, transaction_type, description, date, user_id) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', rows_iter())
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+
+
+@app.route('/bench/legacy-transactions')
+def legacy_transactions():
+    """The original endpoint: every row of every user in one list"""
+    transactions = Transaction.query.all()
+    return jsonify([{
+        'id': t.id,
+        'amount': t.amount,
+        'category': t.category,
+        'type': t.transaction_type,
+        'date': t.date.strftime('%Y-%m-%d')
+    } for t in transactions])
+
+
+def measure(client, urls, revalidate=False, headers=None):
+    """Request each URL once; returns latency percentiles in ms and the mean body size
+
+    With revalidate, each URL is fetched once untimed and then timed with
+    If-None-Match set to its ETag, as a browser revisiting the page would.
+    """
+    latencies, sizes = [], []
+    for url in urls:
+        request_headers = dict(headers or {})
+        if revalidate:
+            request_headers['If-None-Match'] = client.get(url).headers['ETag']
+        started = time.perf_counter()
+        response = client.get(url, headers=request_headers)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == (304 if revalidate else 200), (url, response.status_code)
+        sizes.append(len(response.data))
+    latencies.sort()
+    return {
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'kb': sum(sizes) / len(sizes) / 1024,
+        'requests': len(latencies)
+    }
+
+
+def measure_export(client, url, headers=None):
+    """Download one streamed response; returns seconds, MB on the wire and peak traced heap MB"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(url, headers=headers or {}, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': elapsed, 'mb': size / 1024 / 1024, 'peak_mb': peak / 1024 / 1024}
+
+
+def deep_page_urls(client, pages, **params):
+    """Follow next_cursor from the first page and return the URL of every page visited"""
+    query = '&'.join(f'{key}={value}' for key, value in params.items())
+    urls, cursor = [], None
+    for _ in range(pages):
+        url = f'/api/transactions?{query}' + (f'&cursor={cursor}' if cursor else '')
+        urls.append(url)
+        cursor = client.get(url).get_json()['next_cursor']
+        if not cursor:
+            break
+    return urls
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    started = time.perf_counter()
+    seed(rows)
+    print(f"Seeded {rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(7)
+    client = app.test_client()
+    results = {
+        'legacy (all rows)': measure(client, ['/bench/legacy-transactions'] * 3),
+        'first page': measure(client, ['/api/transactions?limit=50'] * 200),
+        'user first page': measure(client, [f'/api/transactions?limit=50&user_id={rng.randint(1, USERS)}'
+                                            for _ in range(200)]),
+        'user + filters': measure(client, [
+            f'/api/transactions?limit=50&user_id={rng.randint(1, USERS)}&type=expense&category=food'
+            f'&start=2023-01-01&end=2023-12-31' for _ in range(200)]),
+        'pages 1-200 (cursor)': measure(client, deep_page_urls(client, 200, limit=50)),
+        'page of 500, gzip': measure(client, ['/api/transactions?limit=500'] * 200,
+                                     headers={'Accept-Encoding': 'gzip'}),
+        'page of 500, brotli': measure(client, ['/api/transactions?limit=500'] * 200,
+                                       headers={'Accept-Encoding': 'br'}),
+        'pages 1-200 (304)': measure(client, deep_page_urls(client, 200, limit=50), revalidate=True),
+        'summary': measure(client, [f'/api/summary?user_id={rng.randint(1, USERS)}&month=2024-05'
+                                    for _ in range(200)]),
+        'monthly series (12)': measure(client, [f'/api/monthly-series?user_id={rng.randint(1, USERS)}'
+                                                f'&month=2024-06&months=12' for _ in range(200)]),
+        'category breakdown': measure(client, [f'/api/category-breakdown?user_id={rng.randint(1, USERS)}'
+                                               f'&month=2024-05' for _ in range(200)]),
+        'summary (304)': measure(client, [f'/api/summary?user_id={rng.randint(1, USERS)}&month=2024-05'
+                                          for _ in range(200)], revalidate=True),
+    }
+
+    print(f"{'':<24} {'p50 ms':>10} {'p99 ms':>10} {'KB':>10} {'requests':>9}")
+    for name, stats in results.items():
+        print(f"{name:<24} {stats['p50_ms']:>10.1f} {stats['p99_ms']:>10.1f} "
+              f"{stats['kb']:>10.1f} {stats['requests']:>9}")
+
+    exports = {
+        'legacy (all rows)': measure_export(client, '/bench/legacy-transactions'),
+        'ndjson (all rows)': measure_export(client, '/api/transactions/export'),
+        'json (all rows)': measure_export(client, '/api/transactions/export?format=json'),
+        'ndjson gzip (all rows)': measure_export(client, '/api/transactions/export',
+                                                 {'Accept-Encoding': 'gzip'}),
+        'ndjson (one user)': measure_export(client, '/api/transactions/export?user_id=1'),
+    }
+    print(f"\n{'':<24} {'seconds':>10} {'MB':>10} {'peak heap MB':>13}")
+    for name, stats in exports.items():
+        print(f"{name:<24} {stats['seconds']:>10.2f} {stats['mb']:>10.1f} {stats['peak_mb']:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""Micro-benchmarks for FinancialProcessor.
+
+Run from the project root:
+
+    python benchmarks/bench_financial_processor.py [rows]
+
+``rows`` sizes the table used by the summary timings (default 1,000,000).
+The query plans of the processor's statements are checked by
+tests/test_query_plans.py.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.bot.financial_processor import FinancialProcessor
+
+
+def _ops_per_sec(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def bench_connection_reuse(iterations=2000):
+    """Compare pooled connections against reconnecting for every call"""
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = FinancialProcessor(os.path.join(tmp, 'bench.db'))
+        processor.add_transaction(1, 8000000, 'salary', 'income', 'Gaji')
+        for i in range(50):
+            processor.add_transaction(1, 25000 + i, 'food', 'expense', 'Makan')
+
+        def report_reads():
+            processor.get_balance(1)
+            processor.get_monthly_summary(1)
+            processor.get_savings_goals(1)
+
+        def report_reads_reconnecting():
+            # Mimics the old behaviour of opening a connection per call
+            processor.close()
+            processor.get_balance(1)
+            processor.close()
+            processor.get_monthly_summary(1)
+            processor.close()
+            processor.get_savings_goals(1)
+            processor.close()
+
+        def insert():
+            processor.add_transaction(1, 15000, 'transportation', 'expense')
+
+        def insert_reconnecting():
+            processor.close()
+            processor.add_transaction(1, 15000, 'transportation', 'expense')
+
+        results = {
+            'report reads (reconnect)': _ops_per_sec(report_reads_reconnecting, iterations),
+            'report reads (pooled)': _ops_per_sec(report_reads, iterations),
+            'add_transaction (reconnect)': _ops_per_sec(insert_reconnecting, iterations),
+            'add_transaction (pooled)': _ops_per_sec(insert, iterations),
+        }
+        processor.close()
+    return results
+
+
+def _seed_transactions(processor, rows, users=100):
+    """Bulk-load random transactions spread over the last three years"""
+    rng = random.Random(42)
+    now = datetime(2024, 6, 15)
+    categories = ['food', 'housing', 'transportation', 'utilities', 'entertainment']
+
+    def rows_iter():
+        for _ in range(rows):
+            is_income = rng.random() < 0.1
+            yield (
+                rng.randint(1, users),
+                rng.randint(10000, 5000000),
+                'salary' if is_income else rng.choice(categories),
+                'income' if is_income else 'expense',
+                None,
+                (now - timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))).strftime('%Y-%m-%d %H:%M:%S')
+            )
+
+    processor.add_transactions(rows_iter(), chunk_size=50000)
+    conn = processor._get_connection()
+    conn.execute('ANALYZE')
+
+
+# The pre-migration query shape, kept here to measure against
+LEGACY_MONTHLY_QUERY = '''
+    SELECT COALESCE(SUM(amount), 0) FROM transactions
+    WHERE user_id = ?
+    AND transaction_type = 'expense'
+    AND strftime('%m', date) = ?
+    AND strftime('%Y', date) = ?
+'''
+
+RANGE_MONTHLY_QUERY = '''
+    SELECT COALESCE(SUM(amount), 0) FROM transactions
+    WHERE user_id = ?
+    AND transaction_type = 'expense'
+    AND date >= ? AND date < ?
+'''
+
+
+def bench_monthly_summary(rows=1000000, iterations=200):
+    """Time strftime() month filters against half-open date ranges"""
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = FinancialProcessor(os.path.join(tmp, 'bench.db'))
+        _seed_transactions(processor, rows)
+        conn = processor._get_connection()
+
+        def legacy():
+            conn.execute(LEGACY_MONTHLY_QUERY, (7, '05', '2024')).fetchone()
+
+        def ranged():
+            conn.execute(RANGE_MONTHLY_QUERY, (7, '2024-05-01', '2024-06-01')).fetchone()
+
+        def summary():
+            processor.get_monthly_summary(7, 5, 2024)
+
+        results = {
+            'monthly sum (strftime)': _ops_per_sec(legacy, iterations),
+            'monthly sum (date range)': _ops_per_sec(ranged, iterations),
+            'get_monthly_summary': _ops_per_sec(summary, iterations),
+        }
+        processor.close()
+    return results
+
+
+def bench_bulk_insert(rows=200000):
+    """Compare add_transactions against a loop of add_transaction calls"""
+    data = [(i % 100 + 1, 25000.0, 'food', 'expense', 'Makan', f"2024-05-{i % 28 + 1:02d} 12:00:00")
+            for i in range(rows)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = FinancialProcessor(os.path.join(tmp, 'bench.db'))
+        looped = min(rows, 5000)
+        start = time.perf_counter()
+        for user_id, amount, category, transaction_type, description, _ in data[:looped]:
+            processor.add_transaction(user_id, amount, category, transaction_type, description)
+        results['add_transaction loop'] = looped / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        processor.add_transactions(data)
+        results['add_transactions bulk'] = rows / (time.perf_counter() - start)
+        processor.close()
+    return results
+
+
+def _legacy_allocation(conn, user_id, income_amount):
+    """The old per-goal loop, kept here to measure against"""
+    goals = conn.execute('''
+        SELECT id, target_amount, current_amount FROM savings_goals
+        WHERE user_id = ? AND current_amount < target_amount
+    ''', (user_id,)).fetchall()
+    if not goals:
+        return
+    allocation_per_goal = income_amount * 0.2 / len(goals)
+    for goal_id, target, current in goals:
+        conn.execute('UPDATE savings_goals SET current_amount = current_amount + ? WHERE id = ?',
+                     (min(allocation_per_goal, target - current), goal_id))
+    conn.commit()
+
+
+def bench_savings_allocation(goals=500, iterations=500):
+    """Income inserts for a user with many open savings goals"""
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = FinancialProcessor(os.path.join(tmp, 'bench.db'))
+        for i in range(goals):
+            processor.add_savings_goal(1, f"Target {i}", 1e15)
+        conn = processor._get_connection()
+
+        def legacy():
+            conn.execute("INSERT INTO transactions (user_id, amount, category, transaction_type) "
+                         "VALUES (1, 8000000, 'salary', 'income')")
+            conn.commit()
+            _legacy_allocation(conn, 1, 8000000)
+
+        def set_based():
+            processor.add_transaction(1, 8000000, 'salary', 'income')
+
+        results = {
+            f"income, {goals} goals (loop)": _ops_per_sec(legacy, iterations),
+            f"income, {goals} goals (set-based)": _ops_per_sec(set_based, iterations),
+        }
+        processor.close()
+    return results
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    for name, ops in bench_connection_reuse().items():
+        print(f"{name:<32} {ops:>12,.0f} ops/sec")
+
+    print()
+    for name, ops in bench_bulk_insert().items():
+        print(f"{name:<32} {ops:>12,.0f} rows/sec")
+
+    print()
+    for name, ops in bench_savings_allocation().items():
+        print(f"{name:<32} {ops:>12,.0f} ops/sec")
+
+    results = bench_monthly_summary(rows)
+    print(f"\nMonthly summary over {rows:,} rows")
+    for name, ops in results.items():
+        print(f"{name:<32} {ops:>12,.0f} ops/sec")
+
+
+if __name__ == '__main__':
+    main()
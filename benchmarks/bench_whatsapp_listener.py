@@ -0,0 +1,119 @@
+"""Message capture latency: legacy polling loop vs the MutationObserver listener.
+
+Runs headless Chrome against benchmarks/fixtures/whatsapp_web.html, a local
+stand-in for the WhatsApp Web DOM, so no phone or login is needed:
+
+    python benchmarks/bench_whatsapp_listener.py [messages]
+
+Each message arrives in a chat that is not on screen, so both strategies
+have to notice the unread badge, open the chat and read the bubble.
+Latency is measured from delivery into the page until the text is in
+Python.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from src.bot.message_listener import MessageListener
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'whatsapp_web.html')
+CHATS = ['Budi', 'Siti', 'Andi']
+
+
+def _driver():
+    options = Options()
+    options.add_argument('--headless=new')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    return webdriver.Chrome(options=options)
+
+
+def _load(driver):
+    driver.get('file://' + FIXTURE)
+    for chat in CHATS:
+        driver.execute_script("window.stub.addChat(arguments[0]);", chat)
+
+
+def _deliver(driver, index):
+    # Never deliver into the chat that was just opened, so a badge always appears
+    chat = CHATS[index % len(CHATS)]
+    text = f"pengeluaran {1000 + index} makan"
+    driver.execute_script("window.stub.receive(arguments[0], arguments[1]);", chat, text)
+    return time.perf_counter(), text
+
+
+def _summary(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        'msgs_per_sec': len(latencies) / elapsed
+    }
+
+
+def bench_legacy_polling(driver, messages):
+    """The original listen_for_messages loop: wait for a badge, click, sleep, read"""
+    _load(driver)
+    wait = WebDriverWait(driver, 20)
+    latencies = []
+    started = time.perf_counter()
+    for index in range(messages):
+        sent_at, text = _deliver(driver, index)
+        unread = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'span[aria-label="UNREAD"]')))
+        for badge in unread:
+            badge.click()
+            time.sleep(1)
+            bubbles = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'div.message-in')))
+            if bubbles[-1].text == text:
+                latencies.append(time.perf_counter() - sent_at)
+            time.sleep(1)
+    return _summary(latencies, time.perf_counter() - started)
+
+
+def bench_listener(driver, messages):
+    """MessageListener: observer pushes events, one async script call drains them"""
+    _load(driver)
+    listener = MessageListener(driver)
+    listener.install()
+    latencies = []
+    started = time.perf_counter()
+    for index in range(messages):
+        sent_at, text = _deliver(driver, index)
+        received = False
+        while not received:
+            for event in listener.poll(timeout=5):
+                if event['type'] == 'unread':
+                    listener.open_chat(event['chat'], event['count'])
+                elif event['text'] == text:
+                    latencies.append(time.perf_counter() - sent_at)
+                    received = True
+    return _summary(latencies, time.perf_counter() - started)
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    driver = _driver()
+    try:
+        # The legacy loop spends 2s sleeping per message, so keep its run short
+        results = {
+            'legacy polling': bench_legacy_polling(driver, min(messages, 10)),
+            'mutation observer': bench_listener(driver, messages)
+        }
+    finally:
+        driver.quit()
+
+    print(f"{'':<20} {'p50 ms':>10} {'p95 ms':>10} {'msgs/sec':>10}")
+    for name, stats in results.items():
+        print(f"{name:<20} {stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f} {stats['msgs_per_sec']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Bot startup time and memory: headless Chrome vs headed Chrome on Xvfb.
+
+Starts Chrome the way WhatsAppBot.start does (same options, same process
+tracking) in both display modes and loads the local WhatsApp Web stand-in,
+so no phone or login is needed:
+
+    python benchmarks/bench_whatsapp_startup.py [runs]
+
+Startup is measured from before the virtual display (if any) is started
+until the page has loaded. Memory is the summed RSS of chromedriver, every
+Chrome process and Xvfb once the page has settled.
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selenium import webdriver
+
+from src.bot.whatsapp_handler import WhatsAppBot
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'whatsapp_web.html')
+SETTLE_SECONDS = 2
+
+
+def _launch(use_display):
+    """Start one browser like the bot does; returns (startup seconds, RSS by role in MB)"""
+    bot = WhatsAppBot(profile_dir='', use_display=use_display)
+    bot.temp_dir = bot.profile_dir = tempfile.mkdtemp(prefix='bench_chrome_')
+    try:
+        started = time.perf_counter()
+        if use_display:
+            bot._start_display()
+        # selenium locates chromedriver itself, so the bundled one is not required
+        bot.driver = webdriver.Chrome(options=bot._chrome_options(bot._find_browser()))
+        bot._track_browser_processes()
+        bot.driver.get('file://' + FIXTURE)
+        startup = time.perf_counter() - started
+
+        time.sleep(SETTLE_SECONDS)
+        usage = bot.browser_usage()
+        return startup, {role: stats['rss_mb'] for role, stats in usage.items()}
+    finally:
+        bot.cleanup()
+        shutil.rmtree(bot.profile_dir, ignore_errors=True)
+
+
+def bench(use_display, runs):
+    startups, totals, by_role = [], [], {}
+    for _ in range(runs):
+        startup, rss = _launch(use_display)
+        startups.append(startup)
+        totals.append(sum(rss.values()))
+        for role, mb in rss.items():
+            by_role.setdefault(role, []).append(mb)
+    startups.sort()
+    return {
+        'startup_p50_s': startups[len(startups) // 2],
+        'startup_max_s': startups[-1],
+        'rss_mb': sum(totals) / len(totals),
+        'rss_by_role': {role: sum(values) / len(values) for role, values in sorted(by_role.items())}
+    }
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('src').setLevel(logging.WARNING)
+
+    results = {'headless': bench(False, runs)}
+    if shutil.which('Xvfb'):
+        results['xvfb + headed'] = bench(True, runs)
+    else:
+        print("Xvfb not installed, skipping the display mode")
+
+    print(f"{'':<16} {'startup p50 s':>14} {'startup max s':>14} {'RSS MB':>10}  by role")
+    for name, stats in results.items():
+        roles = ", ".join(f"{role}={mb:.0f}" for role, mb in stats['rss_by_role'].items())
+        print(f"{name:<16} {stats['startup_p50_s']:>14.2f} {stats['startup_max_s']:>14.2f} "
+              f"{stats['rss_mb']:>10.0f}  {roles}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
+import signal
+import sys
 import threading
 import time
 from src.dashboard.app import app, db
+from src.bot.financial_processor import FinancialProcessor
 from src.bot.whatsapp_handler import WhatsAppBot
 from src.utils.config import Config
 import logging
@@ -14,8 +17,13 @@ logger = logging.getLogger(__name__)
 
 def start_whatsapp_bot():
     """Start the WhatsApp bot in a separate thread"""
+    bot = None
+    processor = None
     try:
-        bot = WhatsAppBot()
+        # One processor for the bot's lifetime: schema setup runs once and
+        # every worker thread reuses its own connection
+        processor = FinancialProcessor(Config.FINANCIAL_DB_PATH)
+        bot = WhatsAppBot(processor=processor)
         bot.start()
         bot.listen_for_messages()
     except Exception as e:
@@ -23,6 +31,8 @@ def start_whatsapp_bot():
     finally:
         if bot:
             bot.cleanup()
+        if processor:
+            processor.close()
 
 def init_database():
     """Initialize database and create tables"""
@@ -78,7 +88,7 @@ def init_database():
                         )
                     )
                 
-                db.session.add_all(transactions)
+                db.session.bulk_save_objects(transactions)
                 db.session.commit()
             
         logger.info("Database initialized successfully")
@@ -88,6 +98,9 @@ def init_database():
 
 def main():
     """Main entry point of the application"""
+    supervisor = None
+    # Let SIGTERM unwind through the finally below like Ctrl+C does
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     try:
         logger.info("Starting Financial Dashboard Application")
         
@@ -113,8 +126,18 @@ def main():
         # Start WhatsApp bot only if explicitly enabled and not in debug mode
         if Config.WHATSAPP_ENABLED and not Config.DEBUG:
             try:
-                logger.info("Starting WhatsApp bot...")
-                whatsapp_thread = threading.Thread(target=start_whatsapp_bot)
+                target = start_whatsapp_bot
+                if Config.WHATSAPP_SHARDS > 1:
+                    # Each shard runs in its own process with its own Chrome
+                    # profile; the supervisor restarts shards that fail
+                    from src.bot.supervisor import BotSupervisor
+                    logger.info(f"Starting {Config.WHATSAPP_SHARDS} WhatsApp bot shards...")
+                    supervisor = BotSupervisor(Config.WHATSAPP_SHARDS,
+                                               debug_port_base=Config.WHATSAPP_DEBUG_PORT_BASE)
+                    target = supervisor.run
+                else:
+                    logger.info("Starting WhatsApp bot...")
+                whatsapp_thread = threading.Thread(target=target)
                 whatsapp_thread.daemon = True
                 whatsapp_thread.start()
             except Exception as e:
@@ -128,6 +151,11 @@ def main():
     except Exception as e:
         logger.error(f"Application error: {str(e)}")
         raise
+    finally:
+        # The supervisor thread is a daemon and would die with the interpreter,
+        # leaving the shards' Chrome process groups behind
+        if supervisor:
+            supervisor.shutdown()
 
 if __name__ == "__main__":
     main()
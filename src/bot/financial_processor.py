@@ -1,17 +1,224 @@
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
 import json
+import logging
 import sqlite3
+import threading
 import os
 
+# One grouped pass over a user's rows: lifetime totals feed the balance and the
+# conditional columns pick out the requested month
+SUMMARY_SQL = '''
+    SELECT transaction_type, category,
+           SUM(amount),
+           SUM(CASE WHEN date >= ? AND date < ? THEN amount ELSE 0 END),
+           COUNT(CASE WHEN date >= ? AND date < ? THEN 1 END)
+    FROM {table}
+    WHERE user_id = ?
+    GROUP BY transaction_type, category
+'''
+
+# Same row shape restricted to the month, for callers that don't need the balance
+MONTHLY_SUMMARY_SQL = '''
+    SELECT transaction_type, category, 0, SUM(amount), COUNT(*)
+    FROM {table}
+    WHERE user_id = ?
+    AND date >= ? AND date < ?
+    GROUP BY transaction_type, category
+'''
+
+# Reads of the materialized tables: one primary-key lookup each
+MONTHLY_ROLLUP_SQL = '''
+    SELECT type, category, 0, total, count FROM monthly_rollups
+    WHERE user_id = ? AND year = ? AND month = ?
+'''
+
+BALANCE_SQL = 'SELECT balance FROM user_balances WHERE user_id = ?'
+
+# Fold the transactions matching {where} into the materialized rollups. With an
+# id range one statement covers a single insert or a whole batch.
+ROLLUP_UPSERT_SQL = '''
+    INSERT INTO monthly_rollups (user_id, year, month, type, category, total, count)
+    SELECT user_id,
+           CAST(strftime('%Y', date) AS INTEGER),
+           CAST(strftime('%m', date) AS INTEGER),
+           transaction_type, category, SUM(amount), COUNT(*)
+    FROM transactions
+    WHERE {where}
+    GROUP BY 1, 2, 3, 4, 5
+    ON CONFLICT (user_id, year, month, type, category)
+    DO UPDATE SET total = total + excluded.total, count = count + excluded.count
+'''
+
+BALANCE_UPSERT_SQL = '''
+    INSERT INTO user_balances (user_id, total_income, total_expenses, balance)
+    SELECT user_id,
+           SUM(CASE WHEN transaction_type = 'income' THEN amount ELSE 0 END),
+           SUM(CASE WHEN transaction_type = 'expense' THEN amount ELSE 0 END),
+           SUM(CASE WHEN transaction_type = 'income' THEN amount
+                    WHEN transaction_type = 'expense' THEN -amount
+                    ELSE 0 END)
+    FROM transactions
+    WHERE {where}
+    GROUP BY user_id
+    ON CONFLICT (user_id)
+    DO UPDATE SET total_income = total_income + excluded.total_income,
+                  total_expenses = total_expenses + excluded.total_expenses,
+                  balance = balance + excluded.balance
+'''
+
+
+def _fold_summary(rows) -> Dict:
+    """Fold (type, category, total, monthly_total, monthly_count) rows into a report dict"""
+    total_income = total_expenses = 0
+    monthly_income = monthly_expenses = 0
+    expense_categories = {}
+    income_categories = {}
+    for transaction_type, category, total, monthly_total, monthly_count in rows:
+        if transaction_type == 'income':
+            total_income += total
+            monthly_income += monthly_total
+            if monthly_count:
+                income_categories[category] = monthly_total
+        elif transaction_type == 'expense':
+            total_expenses += total
+            monthly_expenses += monthly_total
+            if monthly_count:
+                expense_categories[category] = monthly_total
+
+    return {
+        'current_balance': total_income - total_expenses,
+        'monthly_summary': {
+            'monthly_income': monthly_income,
+            'monthly_expenses': monthly_expenses,
+            'savings': monthly_income - monthly_expenses,
+            'expense_categories': expense_categories,
+            'income_categories': income_categories
+        }
+    }
+
+
+def summarize_transactions(conn, user_id: int, start: str, end: str,
+                           table: str = 'transactions', include_balance: bool = True) -> Dict:
+    """Aggregate balance and the [start, end) income/expense breakdown in one round trip
+
+    Works on any DB-API connection whose table has user_id, amount, category,
+    transaction_type and date columns, so the dashboard can share it.
+    """
+    if include_balance:
+        rows = conn.execute(SUMMARY_SQL.format(table=table),
+                            (start, end, start, end, user_id)).fetchall()
+    else:
+        rows = conn.execute(MONTHLY_SUMMARY_SQL.format(table=table),
+                            (user_id, start, end)).fetchall()
+    return _fold_summary(rows)
+
+
 class FinancialProcessor:
+    # Applied once to every connection when it is opened
+    CONNECTION_PRAGMAS = [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA cache_size=-20000',  # ~20MB page cache
+        'PRAGMA mmap_size=268435456',  # 256MB memory-mapped I/O
+        'PRAGMA temp_store=MEMORY'
+    ]
+
+    # Schema migrations, applied in order and tracked through PRAGMA user_version
+    SCHEMA_MIGRATIONS = [
+        # 1: composite indexes backing per-user date-range summaries
+        [
+            '''CREATE INDEX IF NOT EXISTS idx_transactions_user_type_date
+               ON transactions (user_id, transaction_type, date)''',
+            '''CREATE INDEX IF NOT EXISTS idx_transactions_user_category_date
+               ON transactions (user_id, category, date)'''
+        ],
+        # 2: materialized balances and monthly rollups, backfilled from history
+        [
+            '''CREATE TABLE IF NOT EXISTS user_balances (
+                user_id INTEGER PRIMARY KEY,
+                total_income REAL NOT NULL DEFAULT 0,
+                total_expenses REAL NOT NULL DEFAULT 0,
+                balance REAL NOT NULL DEFAULT 0
+            )''',
+            '''CREATE TABLE IF NOT EXISTS monthly_rollups (
+                user_id INTEGER NOT NULL,
+                year INTEGER NOT NULL,
+                month INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                category TEXT NOT NULL,
+                total REAL NOT NULL DEFAULT 0,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, year, month, type, category)
+            ) WITHOUT ROWID''',
+            'DELETE FROM user_balances',
+            'DELETE FROM monthly_rollups',
+            ROLLUP_UPSERT_SQL.format(where='1'),
+            BALANCE_UPSERT_SQL.format(where='1')
+        ],
+        # 3: per-user lookup for savings allocation and goal listings
+        [
+            'CREATE INDEX IF NOT EXISTS idx_savings_goals_user ON savings_goals (user_id)'
+        ],
+        # 4: owner of each WhatsApp sender (keyed by JID; the title is only a
+        # label), so every sender keeps their own books
+        [
+            '''CREATE TABLE IF NOT EXISTS chat_users (
+                chat TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL UNIQUE,
+                label TEXT
+            )'''
+        ],
+        # 5: WhatsApp messages whose command has been applied, recorded in the same
+        # transaction as its writes so a replay after a crash is skipped
+        [
+            '''CREATE TABLE IF NOT EXISTS applied_messages (
+                key BLOB PRIMARY KEY,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID'''
+        ]
+    ]
+
+    # Share of every income transaction split across a user's open savings goals
+    SAVINGS_ALLOCATION_RATE = 0.2
+
     def __init__(self, db_path: str = 'financial.db'):
         self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._chat_users = {}
+        self._chat_users_lock = threading.Lock()
         self.setup_database()
 
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return the calling thread's long-lived connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # check_same_thread is disabled only so close() can tear down
+            # every thread's connection; each one is still used by its owner
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            for pragma in self.CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Close every connection opened by this processor"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
     def setup_database(self):
         """Initialize the SQLite database and create necessary tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._get_connection()
         cursor = conn.cursor()
 
         # Create transactions table
@@ -42,142 +249,418 @@ class FinancialProcessor:
         ''')
 
         conn.commit()
-        conn.close()
+        self._apply_migrations(conn)
+
+    def _apply_migrations(self, conn: sqlite3.Connection):
+        """Run any schema migrations newer than the database's user_version"""
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for number, statements in enumerate(self.SCHEMA_MIGRATIONS[version:], start=version + 1):
+            try:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {number}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    @staticmethod
+    def _month_range(month: int, year: int) -> tuple:
+        """Return half-open [start, end) date bounds for a calendar month"""
+        start = f"{year:04d}-{month:02d}-01"
+        if month == 12:
+            end = f"{year + 1:04d}-01-01"
+        else:
+            end = f"{year:04d}-{month + 1:02d}-01"
+        return start, end
+
+    @staticmethod
+    def _claim_message(cursor: sqlite3.Cursor, message_key: Optional[bytes]) -> bool:
+        """Record message_key in the open transaction; False if its command was already applied"""
+        if message_key is None:
+            return True
+        cursor.execute('INSERT OR IGNORE INTO applied_messages (key) VALUES (?)', (message_key,))
+        return cursor.rowcount == 1
+
+    def prune_applied_messages(self, max_age_days: float = 30) -> int:
+        """Forget applied message keys older than max_age_days and return how many were removed"""
+        conn = self._get_connection()
+        with conn:
+            cursor = conn.execute("DELETE FROM applied_messages WHERE applied_at < datetime('now', ?)",
+                                  (f'-{max_age_days} days',))
+        return cursor.rowcount
 
     def add_transaction(self, user_id: int, amount: float, category: str, 
-                       transaction_type: str, description: Optional[str] = None) -> bool:
-        """Add a new transaction to the database"""
+                       transaction_type: str, description: Optional[str] = None,
+                       message_key: Optional[bytes] = None) -> bool:
+        """Add a new transaction to the database
+
+        With message_key (the WhatsApp message's ledger key) a transaction
+        already recorded for that message is not recorded again.
+        """
+        conn = self._get_connection()
         try:
-            conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
+            if not self._claim_message(cursor, message_key):
+                conn.rollback()
+                return True
             
             cursor.execute('''
                 INSERT INTO transactions (user_id, amount, category, transaction_type, description)
                 VALUES (?, ?, ?, ?, ?)
             ''', (user_id, amount, category, transaction_type, description))
-            
-            conn.commit()
+            self._update_rollups(cursor, cursor.lastrowid, cursor.lastrowid)
             
             # Update savings goals if it's an income transaction
             if transaction_type == 'income':
-                self._process_savings_allocation(user_id, amount)
-                
+                self._process_savings_allocation(cursor, user_id, amount)
+            
+            conn.commit()
             return True
         except Exception as e:
+            conn.rollback()
             print(f"Error adding transaction: {str(e)}")
             return False
         finally:
-            conn.close()
+            if transaction_type == 'income':
+                self._invalidate_goals(user_id)
 
-    def get_balance(self, user_id: int) -> float:
-        """Calculate current balance for a user"""
+    BULK_INSERT_SQL = '''
+        INSERT INTO transactions (user_id, amount, category, transaction_type, description, date)
+        VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+    '''
+
+    @staticmethod
+    def _normalize_transaction(item) -> tuple:
+        """Validate one bulk row (dict or sequence) and return it as an insert tuple"""
+        if isinstance(item, dict):
+            values = (item.get('user_id'), item.get('amount'), item.get('category'),
+                      item.get('transaction_type'), item.get('description'), item.get('date'))
+        else:
+            values = tuple(item) + (None,) * (6 - len(item))
+            if len(values) != 6:
+                raise ValueError(f"expected at most 6 fields, got {len(item)}")
+        user_id, amount, category, transaction_type, description, date = values
+
+        if user_id is None or not category or not transaction_type:
+            raise ValueError("user_id, category and transaction_type are required")
+        if transaction_type not in ('income', 'expense'):
+            raise ValueError(f"transaction_type must be 'income' or 'expense', got {transaction_type!r}")
+        amount = float(amount)
+        if date is not None and not isinstance(date, datetime):
+            # The rollups group on strftime(date), which is NULL for anything SQLite cannot parse
+            try:
+                date = datetime.fromisoformat(str(date))
+            except ValueError:
+                raise ValueError(f"unrecognised date {date!r}, expected YYYY-MM-DD[ HH:MM:SS]")
+        if isinstance(date, datetime):
+            if date.tzinfo is not None:
+                # Stored like CURRENT_TIMESTAMP: naive UTC
+                date = date.astimezone(timezone.utc).replace(tzinfo=None)
+            date = date.strftime('%Y-%m-%d %H:%M:%S')
+        return (int(user_id), amount, category, transaction_type, description, date)
+
+    def add_transactions(self, transactions: Iterable, chunk_size: int = 10000) -> Dict:
+        """Insert many transactions, committing once per chunk
+
+        Items are dicts with the add_transaction fields (plus an optional
+        date) or tuples in (user_id, amount, category, transaction_type,
+        description, date) order; dates are ISO strings or datetimes.
+        Invalid rows (missing fields, a type other than income/expense, an
+        unparseable date) are skipped and reported by their position in the
+        input instead of aborting the batch.
+        """
+        inserted = 0
+        errors = []
+        chunk = []
+        positions = []
+
+        for index, item in enumerate(transactions):
+            try:
+                chunk.append(self._normalize_transaction(item))
+                positions.append(index)
+            except (TypeError, ValueError) as e:
+                errors.append((index, str(e)))
+            if len(chunk) >= chunk_size:
+                inserted += self._insert_chunk(chunk, positions, errors)
+                chunk, positions = [], []
+        if chunk:
+            inserted += self._insert_chunk(chunk, positions, errors)
+
+        return {'inserted': inserted, 'errors': errors}
+
+    def _insert_chunk(self, rows: List[tuple], positions: List[int], errors: List) -> int:
+        """Insert one chunk in a single transaction, isolating bad rows on failure"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        income_by_user = {}
+        for user_id, amount, _, transaction_type, _, _ in rows:
+            if transaction_type == 'income':
+                income_by_user[user_id] = income_by_user.get(user_id, 0) + amount
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Get sum of income
-            cursor.execute('''
-                SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                WHERE user_id = ? AND transaction_type = 'income'
-            ''', (user_id,))
-            total_income = cursor.fetchone()[0]
-            
-            # Get sum of expenses
-            cursor.execute('''
-                SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                WHERE user_id = ? AND transaction_type = 'expense'
-            ''', (user_id,))
-            total_expenses = cursor.fetchone()[0]
-            
-            return total_income - total_expenses
+            try:
+                cursor.executemany(self.BULK_INSERT_SQL, rows)
+                # AUTOINCREMENT ids from one writer transaction are contiguous
+                last_id = cursor.execute('SELECT MAX(id) FROM transactions').fetchone()[0]
+                self._update_rollups(cursor, last_id - len(rows) + 1, last_id)
+                # Allocate savings once per user for the chunk's combined income
+                for user_id, income in income_by_user.items():
+                    self._process_savings_allocation(cursor, user_id, income)
+                accepted = len(rows)
+            except sqlite3.Error:
+                conn.rollback()
+                accepted = 0
+                # Each row gets a savepoint so a failed rollup or allocation also undoes its insert
+                cursor.execute('BEGIN')
+                for position, row in zip(positions, rows):
+                    cursor.execute('SAVEPOINT bulk_row')
+                    try:
+                        cursor.execute(self.BULK_INSERT_SQL, row)
+                        self._update_rollups(cursor, cursor.lastrowid, cursor.lastrowid)
+                        if row[3] == 'income':
+                            self._process_savings_allocation(cursor, row[0], row[1])
+                        accepted += 1
+                    except sqlite3.Error as e:
+                        cursor.execute('ROLLBACK TO bulk_row')
+                        errors.append((position, str(e)))
+                    cursor.execute('RELEASE bulk_row')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         finally:
-            conn.close()
+            for user_id in income_by_user:
+                self._invalidate_goals(user_id)
+
+        return accepted
+
+    def _update_rollups(self, cursor: sqlite3.Cursor, first_id: int, last_id: int):
+        """Fold newly inserted transactions into user_balances and monthly_rollups"""
+        where = 'id BETWEEN ? AND ?'
+        cursor.execute(ROLLUP_UPSERT_SQL.format(where=where), (first_id, last_id))
+        cursor.execute(BALANCE_UPSERT_SQL.format(where=where), (first_id, last_id))
+
+    def get_balance(self, user_id: int) -> float:
+        """Get current balance for a user from the materialized running total"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(BALANCE_SQL, (user_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
 
     def get_monthly_summary(self, user_id: int, month: Optional[int] = None, 
                           year: Optional[int] = None) -> Dict:
         """Get monthly financial summary"""
+        return self.get_financial_snapshot(user_id, month, year, include_balance=False)['monthly_summary']
+
+    def get_financial_snapshot(self, user_id: int, month: Optional[int] = None,
+                               year: Optional[int] = None, include_balance: bool = True) -> Dict:
+        """Get the current balance and a monthly summary from the materialized rollups"""
         if month is None:
             month = datetime.now().month
         if year is None:
             year = datetime.now().year
 
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(MONTHLY_ROLLUP_SQL, (user_id, year, month))
+        snapshot = _fold_summary(cursor.fetchall())
+        if include_balance:
+            snapshot['current_balance'] = self.get_balance(user_id)
+        return snapshot
+
+    def rebuild_rollups(self, user_id: Optional[int] = None, check_only: bool = False) -> Dict:
+        """Recompute balances and monthly rollups from raw transactions
+
+        Compares the materialized rows with freshly aggregated ones and, unless
+        check_only is set, replaces them. Returns how many rows disagreed.
+        """
+        conn = self._get_connection()
+        where, params = ('user_id = ?', (user_id,)) if user_id is not None else ('1', ())
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Get monthly income
-            cursor.execute('''
-                SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                WHERE user_id = ? 
-                AND transaction_type = 'income'
-                AND strftime('%m', date) = ?
-                AND strftime('%Y', date) = ?
-            ''', (user_id, f"{month:02d}", str(year)))
-            monthly_income = cursor.fetchone()[0]
-            
-            # Get monthly expenses
-            cursor.execute('''
-                SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                WHERE user_id = ? 
-                AND transaction_type = 'expense'
-                AND strftime('%m', date) = ?
-                AND strftime('%Y', date) = ?
-            ''', (user_id, f"{month:02d}", str(year)))
-            monthly_expenses = cursor.fetchone()[0]
-            
-            # Get expense breakdown by category
-            cursor.execute('''
-                SELECT category, SUM(amount) FROM transactions 
-                WHERE user_id = ? 
-                AND transaction_type = 'expense'
-                AND strftime('%m', date) = ?
-                AND strftime('%Y', date) = ?
-                GROUP BY category
-            ''', (user_id, f"{month:02d}", str(year)))
-            expense_categories = dict(cursor.fetchall())
-            
-            return {
-                'monthly_income': monthly_income,
-                'monthly_expenses': monthly_expenses,
-                'savings': monthly_income - monthly_expenses,
-                'expense_categories': expense_categories
-            }
+            # Stage the recomputed values in temp tables shaped like the real ones
+            conn.execute('DROP TABLE IF EXISTS temp.monthly_rollups')
+            conn.execute('DROP TABLE IF EXISTS temp.user_balances')
+            conn.execute('CREATE TEMP TABLE monthly_rollups AS SELECT * FROM main.monthly_rollups WHERE 0')
+            conn.execute('CREATE UNIQUE INDEX temp.rollups_key ON monthly_rollups '
+                         '(user_id, year, month, type, category)')
+            conn.execute('CREATE TEMP TABLE user_balances AS SELECT * FROM main.user_balances WHERE 0')
+            conn.execute('CREATE UNIQUE INDEX temp.balances_key ON user_balances (user_id)')
+            # Unqualified names now resolve to the temp tables
+            conn.execute(ROLLUP_UPSERT_SQL.format(where=where), params)
+            conn.execute(BALANCE_UPSERT_SQL.format(where=where), params)
+
+            rollup_mismatches = conn.execute(f'''
+                SELECT COUNT(*) FROM (
+                    SELECT user_id, year, month, type, category FROM temp.monthly_rollups
+                    UNION
+                    SELECT user_id, year, month, type, category FROM main.monthly_rollups WHERE {where}
+                ) k
+                LEFT JOIN temp.monthly_rollups f USING (user_id, year, month, type, category)
+                LEFT JOIN main.monthly_rollups m USING (user_id, year, month, type, category)
+                WHERE f.count IS NOT m.count OR ABS(COALESCE(f.total, 0) - COALESCE(m.total, 0)) > 0.005
+            ''', params).fetchone()[0]
+            balance_mismatches = conn.execute(f'''
+                SELECT COUNT(*) FROM (
+                    SELECT user_id FROM temp.user_balances
+                    UNION
+                    SELECT user_id FROM main.user_balances WHERE {where}
+                ) k
+                LEFT JOIN temp.user_balances f USING (user_id)
+                LEFT JOIN main.user_balances m USING (user_id)
+                WHERE ABS(COALESCE(f.balance, 0) - COALESCE(m.balance, 0)) > 0.005
+                OR ABS(COALESCE(f.total_income, 0) - COALESCE(m.total_income, 0)) > 0.005
+                OR ABS(COALESCE(f.total_expenses, 0) - COALESCE(m.total_expenses, 0)) > 0.005
+            ''', params).fetchone()[0]
+
+            if not check_only:
+                conn.execute(f'DELETE FROM main.monthly_rollups WHERE {where}', params)
+                conn.execute(f'DELETE FROM main.user_balances WHERE {where}', params)
+                conn.execute('INSERT INTO main.monthly_rollups SELECT * FROM temp.monthly_rollups')
+                conn.execute('INSERT INTO main.user_balances SELECT * FROM temp.user_balances')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         finally:
-            conn.close()
+            conn.execute('DROP TABLE IF EXISTS temp.monthly_rollups')
+            conn.execute('DROP TABLE IF EXISTS temp.user_balances')
+
+        return {
+            'rollups_mismatched': rollup_mismatches,
+            'balances_mismatched': balance_mismatches,
+            'rebuilt': not check_only
+        }
+
+    def _goals_cache(self) -> Dict:
+        """The calling thread's user_id -> (data_version, goals) cache"""
+        cache = getattr(self._local, 'goals', None)
+        if cache is None:
+            cache = self._local.goals = {}
+        return cache
 
     def get_savings_goals(self, user_id: int) -> List[Dict]:
-        """Get all savings goals for a user"""
+        """Get all savings goals for a user, served from the per-user cache when warm
+
+        Entries are kept per connection and tagged with PRAGMA data_version,
+        which changes whenever another connection (another worker thread or
+        process) commits, so their writes turn the entry into a miss. Writes
+        on this connection do not move data_version and call
+        _invalidate_goals instead.
+        """
+        conn = self._get_connection()
+        cache = self._goals_cache()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        cached = cache.get(user_id)
+        if cached is not None and cached[0] == data_version:
+            return [dict(goal) for goal in cached[1]]
+
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, name, target_amount, current_amount, deadline 
+            FROM savings_goals 
+            WHERE user_id = ?
+        ''', (user_id,))
+        
+        goals = []
+        for row in cursor.fetchall():
+            goals.append({
+                'id': row[0],
+                'name': row[1],
+                'target_amount': row[2],
+                'current_amount': row[3],
+                'deadline': row[4],
+                'progress': (row[3] / row[2]) * 100 if row[2] > 0 else 0
+            })
+        
+        # Only cache committed state; a pending write could still be rolled back
+        if not conn.in_transaction:
+            cache[user_id] = (data_version, goals)
+        return [dict(goal) for goal in goals]
+
+    def get_user_id(self, chat: str, label: Optional[str] = None) -> int:
+        """Return the user_id that owns a WhatsApp chat, registering new chats
+
+        chat is the sender's JID (e.g. 6281234567890@c.us), which survives
+        renames and tells apart contacts with the same name; label is the
+        title of a 1:1 chat, kept only for reference (None for groups, whose
+        title does not name the sender). A new chat gets
+        the next id above every user_id in use, so it never shares books
+        with an existing user unless linked with link_chat().
+        """
+        with self._chat_users_lock:
+            user_id = self._chat_users.get(chat)
+        if user_id is not None:
+            return user_id
+
+        conn = self._get_connection()
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT id, name, target_amount, current_amount, deadline 
-                FROM savings_goals 
-                WHERE user_id = ?
-            ''', (user_id,))
-            
-            goals = []
-            for row in cursor.fetchall():
-                goals.append({
-                    'id': row[0],
-                    'name': row[1],
-                    'target_amount': row[2],
-                    'current_amount': row[3],
-                    'deadline': row[4],
-                    'progress': (row[3] / row[2]) * 100 if row[2] > 0 else 0
-                })
-            
-            return goals
-        finally:
-            conn.close()
+            # Shards share the database; take the write lock before picking an id
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT user_id FROM chat_users WHERE chat = ?', (chat,)).fetchone()
+            if row is None and label and chat.endswith('@c.us'):
+                # Chats registered by title (a message without a JID, or --link-chat
+                # with a title) are taken over by the first 1:1 chat JID seen under
+                # that title. Group members never take over a row: the title names
+                # the group, so its history is left for an explicit --link-chat
+                row = conn.execute(
+                    "SELECT user_id FROM chat_users WHERE chat = ? AND chat NOT LIKE '%@%'", (label,)
+                ).fetchone()
+                if row:
+                    conn.execute('UPDATE chat_users SET chat = ? WHERE chat = ?', (chat, label))
+            if row:
+                user_id = row[0]
+                if label:
+                    conn.execute('UPDATE chat_users SET label = ? WHERE chat = ?', (label, chat))
+            else:
+                user_id = conn.execute('''
+                    SELECT MAX(COALESCE((SELECT MAX(user_id) FROM chat_users), 0),
+                               COALESCE((SELECT MAX(user_id) FROM transactions), 0)) + 1
+                ''').fetchone()[0]
+                conn.execute('INSERT INTO chat_users (chat, user_id, label) VALUES (?, ?, ?)',
+                             (chat, user_id, label))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        with self._chat_users_lock:
+            self._chat_users[chat] = user_id
+        return user_id
+
+    def link_chat(self, chat: str, user_id: int):
+        """Make user_id the owner of a WhatsApp chat (its JID), e.g. to attach it to existing records"""
+        conn = self._get_connection()
+        try:
+            conn.execute('DELETE FROM chat_users WHERE user_id = ? AND chat != ?', (user_id, chat))
+            conn.execute('''
+                INSERT INTO chat_users (chat, user_id) VALUES (?, ?)
+                ON CONFLICT (chat) DO UPDATE SET user_id = excluded.user_id
+            ''', (chat, user_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        with self._chat_users_lock:
+            self._chat_users = {key: value for key, value in self._chat_users.items() if value != user_id}
+            self._chat_users[chat] = user_id
+
+    def _invalidate_goals(self, user_id: int):
+        """Drop a user's cached goals after this thread's connection changed their rows"""
+        self._goals_cache().pop(user_id, None)
 
     def add_savings_goal(self, user_id: int, name: str, target_amount: float, 
-                        deadline: Optional[str] = None) -> bool:
-        """Add a new savings goal"""
+                        deadline: Optional[str] = None, message_key: Optional[bytes] = None) -> bool:
+        """Add a new savings goal, once per message_key like add_transaction"""
+        conn = self._get_connection()
         try:
-            conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
+            if not self._claim_message(cursor, message_key):
+                conn.rollback()
+                return True
             
             cursor.execute('''
                 INSERT INTO savings_goals (user_id, name, target_amount, deadline)
@@ -187,58 +670,45 @@ class FinancialProcessor:
             conn.commit()
             return True
         except Exception as e:
+            conn.rollback()
             print(f"Error adding savings goal: {str(e)}")
             return False
         finally:
-            conn.close()
+            self._invalidate_goals(user_id)
 
-    def _process_savings_allocation(self, user_id: int, income_amount: float):
-        """Automatically allocate a portion of income to savings goals"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Get all active savings goals
-            cursor.execute('''
-                SELECT id, target_amount, current_amount 
-                FROM savings_goals 
-                WHERE user_id = ? 
-                AND current_amount < target_amount
-            ''', (user_id,))
-            
-            goals = cursor.fetchall()
-            if not goals:
-                return
-            
-            # Allocate 20% of income among savings goals
-            savings_amount = income_amount * 0.2
-            allocation_per_goal = savings_amount / len(goals)
-            
-            for goal_id, target, current in goals:
-                # Calculate how much can be added without exceeding target
-                remaining = target - current
-                to_add = min(allocation_per_goal, remaining)
-                
-                cursor.execute('''
-                    UPDATE savings_goals 
-                    SET current_amount = current_amount + ?
-                    WHERE id = ?
-                ''', (to_add, goal_id))
-            
-            conn.commit()
-        finally:
-            conn.close()
+    def _process_savings_allocation(self, cursor: sqlite3.Cursor, user_id: int, income_amount: float):
+        """Automatically allocate a portion of income to savings goals
 
-    def get_financial_advice(self, user_id: int) -> str:
+        Runs on the caller's cursor so the allocation commits or rolls back
+        together with the income that triggered it. The open goals are counted
+        by an uncorrelated subquery, which SQLite evaluates once, before any row
+        changes; then every goal gets an equal share capped at its remaining
+        amount in one statement. (UPDATE ... FROM would need SQLite 3.33.)
+        """
+        cursor.execute('''
+            UPDATE savings_goals
+            SET current_amount = MIN(target_amount, current_amount + (
+                SELECT ? / COUNT(*) FROM savings_goals AS open_goals
+                WHERE open_goals.user_id = ? AND open_goals.current_amount < open_goals.target_amount
+            ))
+            WHERE user_id = ?
+            AND current_amount < target_amount
+        ''', (income_amount * self.SAVINGS_ALLOCATION_RATE, user_id, user_id))
+
+    def get_financial_advice(self, user_id: int, snapshot: Optional[Dict] = None,
+                             savings_goals: Optional[List[Dict]] = None) -> str:
         """Generate personalized financial advice using AI based on spending patterns"""
         try:
-            import requests
             from src.utils.config import Config
+            from src.utils.market_data import get_market_snapshot
             
-            # Get user's financial data
-            monthly_summary = self.get_monthly_summary(user_id)
-            balance = self.get_balance(user_id)
-            savings_goals = self.get_savings_goals(user_id)
+            # Get user's financial data, reusing anything the caller already loaded
+            if snapshot is None:
+                snapshot = self.get_financial_snapshot(user_id)
+            if savings_goals is None:
+                savings_goals = self.get_savings_goals(user_id)
+            monthly_summary = snapshot['monthly_summary']
+            balance = snapshot['current_balance']
             
             # Calculate key financial metrics
             monthly_income = monthly_summary['monthly_income']
@@ -246,23 +716,14 @@ class FinancialProcessor:
             savings_rate = (monthly_summary['savings'] / monthly_income * 100) if monthly_income > 0 else 0
             expense_categories = monthly_summary['expense_categories']
             
-            # Get current exchange rates
-            try:
-                exchange_url = f"https://v6.exchangerate-api.com/v6/{Config.EXCHANGE_RATE_API_KEY}/latest/IDR"
-                exchange_response = requests.get(exchange_url)
-                exchange_data = exchange_response.json()
-                usd_rate = exchange_data['conversion_rates']['USD']
-            except:
-                usd_rate = None
+            # Get current exchange rates and IHSG quote from the shared market data cache,
+            # fetched concurrently when cold; either part may be missing
+            market = get_market_snapshot()
+            rates = market['exchange_rates']
+            usd_rate = rates.get('USD') if rates else None
             
-            # Get market data from Alpha Vantage
-            try:
-                alpha_url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol=^JKSE&apikey={Config.ALPHA_VANTAGE_API_KEY}"
-                market_response = requests.get(alpha_url)
-                market_data = market_response.json()
-                market_change = market_data.get('Global Quote', {}).get('10. change percent', 'N/A')
-            except:
-                market_change = None
+            quote = market['ihsg_quote']
+            market_change = quote.get('10. change percent', 'N/A') if quote is not None else None
             
             # Prepare context for AI advice
             context = {
@@ -351,12 +812,39 @@ class FinancialProcessor:
 
     def generate_report(self, user_id: int) -> Dict:
         """Generate a comprehensive financial report"""
-        current_month = datetime.now().month
-        current_year = datetime.now().year
+        snapshot = self.get_financial_snapshot(user_id)
+        savings_goals = self.get_savings_goals(user_id)
         
         return {
-            'current_balance': self.get_balance(user_id),
-            'monthly_summary': self.get_monthly_summary(user_id),
-            'savings_goals': self.get_savings_goals(user_id),
-            'advice': self.get_financial_advice(user_id)
+            'current_balance': snapshot['current_balance'],
+            'monthly_summary': snapshot['monthly_summary'],
+            'savings_goals': savings_goals,
+            'advice': self.get_financial_advice(user_id, snapshot, savings_goals)
         }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild or verify materialized balances and monthly rollups")
+    parser.add_argument('--db', default='financial.db', help="path to the SQLite database")
+    parser.add_argument('--user-id', type=int, help="only rebuild this user's rows")
+    parser.add_argument('--check', action='store_true', help="report mismatches without rewriting")
+    parser.add_argument('--link-chat', metavar='JID',
+                        help="make --user-id the owner of a WhatsApp chat (e.g. 6281234567890@c.us) and exit")
+    args = parser.parse_args()
+    if args.link_chat and args.user_id is None:
+        parser.error("--link-chat requires --user-id")
+
+    processor = FinancialProcessor(args.db)
+    try:
+        if args.link_chat:
+            processor.link_chat(args.link_chat, args.user_id)
+            print(f"Chat {args.link_chat} linked to user {args.user_id}")
+            raise SystemExit(0)
+        result = processor.rebuild_rollups(args.user_id, check_only=args.check)
+    finally:
+        processor.close()
+    print(f"Mismatched rollup rows: {result['rollups_mismatched']}")
+    print(f"Mismatched balance rows: {result['balances_mismatched']}")
+    print("Rollups rebuilt" if result['rebuilt'] else "Check only, nothing rewritten")
@@ -0,0 +1,219 @@
+"""Stream bank statement CSV exports into the transactions table.
+
+Usage:
+    python -m src.bot.importer statement.csv --user-id 1 [--layout bca|mandiri] [--db financial.db]
+
+Rows are parsed one at a time through a chain of generators and written
+with FinancialProcessor.add_transactions, so memory use depends on the
+chunk size rather than on the size of the file.
+"""
+import argparse
+import csv
+import re
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from src.bot.financial_processor import FinancialProcessor
+from src.bot.indonesian_commands import IndonesianCommands
+
+# Header cells that identify each supported export layout
+LAYOUTS = {
+    # KlikBCA: Tanggal Transaksi, Keterangan, Cabang, Jumlah ("1,500,000.00 DB"), Saldo
+    'bca': {
+        'date': ['tanggal transaksi', 'tanggal'],
+        'description': ['keterangan'],
+        'amount': ['jumlah'],
+    },
+    # Mandiri: Date, Description, Debit, Credit (separate amount columns)
+    'mandiri': {
+        'date': ['tanggal', 'date', 'posting date'],
+        'description': ['keterangan', 'description', 'remarks'],
+        'debit': ['debit', 'debet'],
+        'credit': ['credit', 'kredit'],
+    },
+}
+
+DATE_FORMATS = ['%d/%m/%Y', '%d/%m/%y', '%Y-%m-%d', '%d-%m-%Y', '%d %b %Y']
+
+WORD_PATTERN = re.compile(r'[a-z]+')
+AMOUNT_NOISE = re.compile(r'[^0-9.,-]')
+
+
+def parse_amount(text: str) -> float:
+    """Parse Indonesian or English formatted amounts ("1.500.000,00", "1,500,000.00")"""
+    cleaned = AMOUNT_NOISE.sub('', text or '')
+    if not cleaned or cleaned == '-':
+        raise ValueError(f"no amount in {text!r}")
+    if '.' in cleaned and ',' in cleaned:
+        # Whichever separator comes last is the decimal point
+        if cleaned.rfind(',') > cleaned.rfind('.'):
+            cleaned = cleaned.replace('.', '').replace(',', '.')
+        else:
+            cleaned = cleaned.replace(',', '')
+    else:
+        separator = ',' if ',' in cleaned else '.'
+        parts = cleaned.split(separator)
+        if len(parts) > 2 or (len(parts) == 2 and len(parts[1]) == 3):
+            cleaned = cleaned.replace(separator, '')
+        else:
+            cleaned = cleaned.replace(separator, '.')
+    return abs(float(cleaned))
+
+
+@lru_cache(maxsize=4096)
+def parse_date(text: str, year: Optional[int] = None) -> str:
+    """Parse a statement date into the 'YYYY-MM-DD HH:MM:SS' form used by the database
+
+    Statements repeat the same few hundred dates, so results are cached to
+    keep strptime off the per-row path.
+    """
+    text = (text or '').strip().lstrip("'")
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime('%Y-%m-%d 00:00:00')
+        except ValueError:
+            continue
+    # BCA exports omit the year; append it before parsing, since strptime
+    # alone defaults to 1900 and rejects 29/02
+    try:
+        parsed = datetime.strptime(f"{text}/{year or datetime.now().year}", '%d/%m/%Y')
+    except ValueError:
+        raise ValueError(f"unrecognised date {text!r}")
+    return parsed.strftime('%Y-%m-%d 00:00:00')
+
+
+def categorize(description: str, transaction_type: str) -> str:
+    """Map statement keywords to categories through the Indonesian command tables"""
+    mapping = (IndonesianCommands.INCOME_CATEGORIES if transaction_type == 'income'
+               else IndonesianCommands.EXPENSE_CATEGORIES)
+    for word in WORD_PATTERN.findall((description or '').lower()):
+        category = mapping.get(word)
+        if category:
+            return category
+    return 'other'
+
+
+def _find_columns(header: List[str], layout: str) -> Optional[Dict[str, int]]:
+    """Return column positions for a layout if the header row matches it"""
+    cells = [cell.strip().lower() for cell in header]
+    columns = {}
+    for field, names in LAYOUTS[layout].items():
+        for name in names:
+            if name in cells:
+                columns[field] = cells.index(name)
+                break
+        else:
+            return None
+    return columns
+
+
+def read_statement(lines: Iterable[str], layout: str = 'auto') -> Iterator[Dict[str, str]]:
+    """Yield raw statement rows as dicts, skipping the account preamble before the header"""
+    reader = csv.reader(lines)
+    columns = None
+    for row in reader:
+        if columns is None:
+            candidates = LAYOUTS if layout == 'auto' else [layout]
+            for name in candidates:
+                columns = _find_columns(row, name)
+                if columns:
+                    break
+            continue
+        if not any(cell.strip() for cell in row):
+            continue
+        yield {field: row[index] if index < len(row) else '' for field, index in columns.items()}
+    if columns is None:
+        raise ValueError(f"no {layout if layout != 'auto' else 'known'} statement header found")
+
+
+def to_transactions(rows: Iterable[Dict[str, str]], user_id: int, year: Optional[int] = None,
+                    counts: Optional[Dict[str, int]] = None) -> Iterator[tuple]:
+    """Convert raw statement rows into add_transactions tuples, counting unparseable rows"""
+    for row in rows:
+        try:
+            if 'amount' in row:
+                amount_text = row['amount']
+                transaction_type = 'income' if 'CR' in amount_text.upper() else 'expense'
+                amount = parse_amount(amount_text)
+            elif (row.get('credit') or '').strip() and parse_amount(row['credit']) > 0:
+                transaction_type = 'income'
+                amount = parse_amount(row['credit'])
+            else:
+                transaction_type = 'expense'
+                amount = parse_amount(row['debit'])
+            description = row['description'].strip()
+            date = parse_date(row['date'], year)
+        except (KeyError, ValueError):
+            if counts is not None:
+                counts['skipped'] = counts.get('skipped', 0) + 1
+            continue
+        yield (user_id, amount, categorize(description, transaction_type), transaction_type,
+               description, date)
+
+
+def _report_progress(rows: Iterable[tuple], every: int, started: float) -> Iterator[tuple]:
+    """Pass rows through unchanged while printing running throughput"""
+    count = 0
+    for row in rows:
+        count += 1
+        if count % every == 0:
+            elapsed = time.perf_counter() - started
+            print(f"{count:,} rows ({count / elapsed:,.0f} rows/sec)", flush=True)
+        yield row
+
+
+def import_statement(path: str, user_id: int, processor: FinancialProcessor, layout: str = 'auto',
+                     year: Optional[int] = None, encoding: str = 'utf-8-sig',
+                     chunk_size: int = 10000, progress_every: int = 100000) -> Dict:
+    """Stream one statement file into the database and return import statistics"""
+    counts = {'skipped': 0}
+    started = time.perf_counter()
+    with open(path, newline='', encoding=encoding, errors='replace') as handle:
+        rows = to_transactions(read_statement(handle, layout), user_id, year, counts)
+        if progress_every:
+            rows = _report_progress(rows, progress_every, started)
+        result = processor.add_transactions(rows, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'inserted': result['inserted'],
+        'rejected': len(result['errors']),
+        'skipped': counts['skipped'],
+        'seconds': elapsed,
+        'rows_per_sec': result['inserted'] / elapsed if elapsed > 0 else 0
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import a bank statement CSV into the transactions table")
+    parser.add_argument('path', help="CSV export from internet banking")
+    parser.add_argument('--user-id', type=int, required=True, help="owner of the imported transactions")
+    parser.add_argument('--layout', choices=['auto'] + sorted(LAYOUTS), default='auto')
+    parser.add_argument('--db', default='financial.db', help="path to the SQLite database")
+    parser.add_argument('--year', type=int, help="year for exports whose dates omit it (BCA)")
+    parser.add_argument('--encoding', default='utf-8-sig')
+    parser.add_argument('--chunk-size', type=int, default=10000, help="rows per committed batch")
+    args = parser.parse_args(argv)
+
+    processor = FinancialProcessor(args.db)
+    try:
+        stats = import_statement(args.path, args.user_id, processor, args.layout, args.year,
+                                 args.encoding, args.chunk_size)
+    except (OSError, ValueError) as e:
+        print(f"Import failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        processor.close()
+
+    print(f"Imported {stats['inserted']:,} rows in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_sec']:,.0f} rows/sec)")
+    if stats['skipped'] or stats['rejected']:
+        print(f"Skipped {stats['skipped']:,} unparseable rows, {stats['rejected']:,} rejected by the database")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
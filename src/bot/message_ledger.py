@@ -0,0 +1,154 @@
+"""Ledger of processed WhatsApp messages.
+
+Every incoming message is claimed in the ledger before it is queued for a
+handler, so a message seen again after a retry, a reopened chat or a bot
+restart is recognised and skipped. Each entry moves through three states:
+
+    pending  -> claimed, handler not finished yet
+    handled  -> handler ran (its side effects are committed), reply stored
+    replied  -> reply delivered
+
+After a crash, pending messages are handed back to the handlers and
+handled ones only have their stored reply resent. Delivery to the handlers
+is at least once: a crash after a command committed but before
+mark_handled replays it. Commands that record transactions or savings
+goals pass the ledger key to FinancialProcessor, which stores it in the
+same database transaction and skips a replay, so a 'pengeluaran' is still
+recorded only once. Entries are keyed by a short hash of the chat and
+WhatsApp message id; an LRU in front of SQLite answers repeat lookups
+from memory.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class MessageLedger:
+    """SQLite-backed record of which messages have been processed, with an LRU front"""
+
+    CONNECTION_PRAGMAS = (
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+    )
+
+    def __init__(self, db_path: str, cache_size: int = 10000):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # key -> status, most recently used last
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        # Shared by the driver thread and the workers, serialised by _lock
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        for pragma in self.CONNECTION_PRAGMAS:
+            self._conn.execute(pragma)
+        self.setup_database()
+
+    def setup_database(self):
+        with self._lock, self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS processed_messages (
+                    key BLOB PRIMARY KEY,
+                    chat TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    message TEXT,
+                    reply TEXT,
+                    sender TEXT,
+                    in_group INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            self._conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_processed_messages_status
+                ON processed_messages (status, updated_at)
+            ''')
+            # Per-chat high-water marks written by earlier versions, never read
+            self._conn.execute('DROP TABLE IF EXISTS chat_marks')
+
+    @staticmethod
+    def message_key(chat: str, message_id: str) -> bytes:
+        """Compact 16-byte key for a chat's message id"""
+        return hashlib.blake2b(f"{chat}\x00{message_id}".encode('utf-8'), digest_size=16).digest()
+
+    def _remember(self, key: bytes, status: str):
+        """Record a status in the LRU, evicting the least recently used entry when full"""
+        self._cache[key] = status
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def claim(self, chat: str, message_id: str, message: str, sender: Optional[str] = None,
+              in_group: bool = False) -> Optional[bytes]:
+        """Claim a message for processing and return its ledger key
+
+        sender is the author's JID and in_group whether chat is a group,
+        kept so a recovered message is booked to the same user. Returns None
+        if the message was claimed before, by this run or an earlier one.
+        """
+        key = self.message_key(chat, message_id)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return None
+            with self._conn:
+                cursor = self._conn.execute('''
+                    INSERT OR IGNORE INTO processed_messages
+                        (key, chat, status, message, sender, in_group, updated_at)
+                    VALUES (?, ?, 'pending', ?, ?, ?, ?)
+                ''', (key, chat, message, sender, int(in_group), time.time()))
+            if cursor.rowcount:
+                self._remember(key, 'pending')
+                return key
+            row = self._conn.execute('SELECT status FROM processed_messages WHERE key = ?', (key,)).fetchone()
+            self._remember(key, row[0] if row else 'pending')
+            return None
+
+    def mark_handled(self, key: bytes, reply: str):
+        """The handler finished; keep its reply so a restart only needs to resend it"""
+        with self._lock, self._conn:
+            self._conn.execute('''
+                UPDATE processed_messages SET status = 'handled', reply = ?, updated_at = ? WHERE key = ?
+            ''', (reply, time.time(), key))
+            self._remember(key, 'handled')
+
+    def mark_replied(self, key: bytes):
+        """The reply was delivered: drop the stored texts"""
+        with self._lock, self._conn:
+            self._conn.execute('''
+                UPDATE processed_messages SET status = 'replied', message = NULL, reply = NULL, updated_at = ?
+                WHERE key = ?
+            ''', (time.time(), key))
+            self._remember(key, 'replied')
+
+    def unfinished(self) -> List[Dict]:
+        """Messages a previous run left pending or handled, oldest first"""
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT key, chat, status, message, reply, sender, in_group, updated_at FROM processed_messages
+                WHERE status IN ('pending', 'handled')
+                ORDER BY updated_at
+            ''').fetchall()
+        return [{'key': key, 'chat': chat, 'status': status, 'message': message, 'reply': reply,
+                 'sender': sender, 'in_group': bool(in_group), 'updated_at': updated_at}
+                for key, chat, status, message, reply, sender, in_group, updated_at in rows]
+
+    def prune(self, max_age_days: float = 30) -> int:
+        """Delete replied entries older than max_age_days and return how many were removed
+
+        Messages that old are far outside what WhatsApp Web shows as unread,
+        so forgetting them cannot cause a reprocess.
+        """
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM processed_messages WHERE status = 'replied' AND updated_at < ?", (cutoff,))
+        if cursor.rowcount:
+            self.logger.info(f"Pruned {cursor.rowcount} old ledger entries")
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
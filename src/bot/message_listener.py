@@ -0,0 +1,237 @@
+"""Event-driven capture of incoming WhatsApp Web messages.
+
+A MutationObserver installed in the page watches the chat list for unread
+badges and the open conversation for new incoming bubbles, and pushes
+both into an in-page queue. Python collects everything that happened
+since the last tick with a single execute_async_script call, which
+returns as soon as the queue is non-empty (or after a timeout), instead
+of polling and clicking through the DOM with one WebDriver round trip
+per element.
+"""
+import logging
+from typing import Dict, List, Optional
+
+# CSS selectors for the parts of the WhatsApp Web DOM the listener relies on
+SELECTORS = {
+    'unread_badge': 'span[aria-label="UNREAD"], span[aria-label*="unread message"]',
+    'chat_row': '[role="listitem"], [role="row"]',
+    'chat_title': 'span[title]',
+    'conversation': '#main',
+    'conversation_title': '#main header span[title]',
+    'incoming': 'div.message-in',
+    'message_text': 'span.selectable-text',
+    'message_meta': '[data-pre-plain-text]',
+    'outgoing': '#main div.message-out',
+    'compose': '#main footer div[contenteditable="true"]',
+    'send_button': '#main footer button[aria-label="Send"], #main footer span[data-icon="send"]'
+}
+
+LISTENER_JS = r"""
+var selectors = arguments[0];
+var VERSION = 3;
+// Message ids remembered as seen; the oldest are forgotten past this, and the
+// Python-side ledger still catches any that turn up again
+var MAX_SEEN = 5000;
+if (window.__waBot && window.__waBot.version === VERSION) { return true; }
+if (window.__waBot && window.__waBot.observer) { window.__waBot.observer.disconnect(); }
+
+var bot = {
+    version: VERSION,
+    queue: [],
+    waiters: [],
+    seen: new Set(),
+    unread: {},
+    expect: null,
+    current: null,
+    last: null
+};
+
+function conversationTitle() {
+    var header = document.querySelector(selectors.conversation_title);
+    return header ? header.getAttribute('title') : null;
+}
+
+function messageId(el) {
+    var row = el.closest('[data-id]');
+    if (row) { return row.getAttribute('data-id'); }
+    var meta = el.querySelector(selectors.message_meta);
+    return (meta ? meta.getAttribute('data-pre-plain-text') : '') + '|' + el.innerText;
+}
+
+function senderJid(id) {
+    // data-id is fromMe_chatJid_messageId, with the author's JID appended in groups
+    var parts = id.split('_');
+    if (parts.length < 3 || parts[1].indexOf('@') < 0) { return null; }
+    var author = parts[parts.length - 1];
+    return (parts.length > 3 && author.indexOf('@') > 0) ? author : parts[1];
+}
+
+function inGroup(id) {
+    return id.split('_')[1].slice(-5) === '@g.us';
+}
+
+function messageText(el) {
+    var span = el.querySelector(selectors.message_text);
+    return (span || el).innerText;
+}
+
+function markSeen(id) {
+    bot.seen.add(id);
+    if (bot.seen.size > MAX_SEEN) {
+        // Sets iterate in insertion order, so this is the oldest id
+        bot.seen.delete(bot.seen.values().next().value);
+    }
+}
+
+function push(event) {
+    bot.queue.push(event);
+    bot.waiters.splice(0).forEach(function (wake) { wake(); });
+}
+
+function queueMessage(el, chat) {
+    var id = messageId(el);
+    bot.last = el;
+    if (bot.seen.has(id)) { return; }
+    markSeen(id);
+    var sender = senderJid(id);
+    push({type: 'message', chat: chat, sender: sender, group: Boolean(sender) && inGroup(id), id: id,
+          text: messageText(el), at: Date.now()});
+}
+
+function incomingInConversation() {
+    var pane = document.querySelector(selectors.conversation);
+    return pane ? Array.prototype.slice.call(pane.querySelectorAll(selectors.incoming)) : [];
+}
+
+function scanUnread() {
+    var active = {};
+    document.querySelectorAll(selectors.unread_badge).forEach(function (badge) {
+        var row = badge.closest(selectors.chat_row);
+        var titleEl = row && row.querySelector(selectors.chat_title);
+        if (!titleEl) { return; }
+        var chat = titleEl.getAttribute('title');
+        var count = parseInt(badge.innerText, 10) || 1;
+        active[chat] = count;
+        if (bot.unread[chat] !== count) {
+            bot.unread[chat] = count;
+            push({type: 'unread', chat: chat, count: count, at: Date.now()});
+        }
+    });
+    Object.keys(bot.unread).forEach(function (chat) {
+        if (!(chat in active)) { delete bot.unread[chat]; }
+    });
+}
+
+function scanConversation(mutations) {
+    var title = conversationTitle();
+    var messages = incomingInConversation();
+    if (!title || !messages.length) { return; }
+
+    if (title !== bot.current) {
+        // A different chat finished rendering: only the last `count` bubbles are new,
+        // everything above them is history and is marked as seen
+        var fresh = (bot.expect && bot.expect.chat === title) ? bot.expect.count : 0;
+        var cutoff = Math.max(messages.length - fresh, 0);
+        messages.slice(0, cutoff).forEach(function (el) { markSeen(messageId(el)); });
+        messages.slice(cutoff).forEach(function (el) { queueMessage(el, title); });
+        bot.current = title;
+        bot.last = messages[messages.length - 1];
+        bot.expect = null;
+        return;
+    }
+
+    // Same chat: queue bubbles appended after the newest one we know about,
+    // ignoring older history rendered above it while scrolling
+    messages.forEach(function (el) {
+        if (!bot.last || !document.contains(bot.last) ||
+                (bot.last.compareDocumentPosition(el) & Node.DOCUMENT_POSITION_FOLLOWING)) {
+            queueMessage(el, title);
+        }
+    });
+}
+
+bot.observer = new MutationObserver(function (mutations) {
+    scanUnread();
+    scanConversation(mutations);
+});
+bot.observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+
+bot.drain = function () {
+    return bot.queue.splice(0);
+};
+
+bot.open = function (chat, count) {
+    var rows = document.querySelectorAll(selectors.chat_row);
+    for (var i = 0; i < rows.length; i++) {
+        var titleEl = rows[i].querySelector(selectors.chat_title);
+        if (titleEl && titleEl.getAttribute('title') === chat) {
+            bot.expect = {chat: chat, count: typeof count === 'number' ? count : 1};
+            ['mousedown', 'mouseup', 'click'].forEach(function (type) {
+                titleEl.dispatchEvent(new MouseEvent(type, {bubbles: true, cancelable: true, view: window}));
+            });
+            return true;
+        }
+    }
+    return false;
+};
+
+window.__waBot = bot;
+scanUnread();
+bot.current = conversationTitle();
+var existing = incomingInConversation();
+existing.forEach(function (el) { markSeen(messageId(el)); });
+bot.last = existing.length ? existing[existing.length - 1] : null;
+return true;
+"""
+
+# Resolve with queued events as soon as there are any, or with [] after timeout_ms
+POLL_JS = r"""
+var timeoutMs = arguments[0];
+var done = arguments[arguments.length - 1];
+var bot = window.__waBot;
+if (!bot) { done(null); return; }
+if (bot.queue.length) { done(bot.drain()); return; }
+var timer = setTimeout(function () { done(bot.drain()); }, timeoutMs);
+bot.waiters.push(function () { clearTimeout(timer); done(bot.drain()); });
+"""
+
+
+class MessageListener:
+    """Python side of the in-page message listener"""
+
+    def __init__(self, driver, selectors: Optional[Dict[str, str]] = None):
+        self.driver = driver
+        self.selectors = dict(SELECTORS, **(selectors or {}))
+        self.logger = logging.getLogger(__name__)
+
+    def install(self):
+        """Inject the observer; a no-op if this page already has it"""
+        self.driver.execute_script(LISTENER_JS, self.selectors)
+        self.logger.info("Message listener installed")
+
+    def poll(self, timeout: float = 5.0) -> List[Dict]:
+        """Wait up to timeout seconds for events and return all of them in one round trip"""
+        self.driver.set_script_timeout(timeout + 5)
+        events = self.driver.execute_async_script(POLL_JS, int(timeout * 1000))
+        if events is None:
+            # The page reloaded and lost the observer
+            self.logger.warning("Message listener missing from page, reinstalling")
+            self.install()
+            return []
+        return events
+
+    def open_chat(self, chat: str, unread_count: int = 1) -> bool:
+        """Open a chat; its newest unread_count messages will arrive as message events
+
+        Pass 0 to open a chat only to reply in it; its history is then marked as seen.
+        """
+        return bool(self.driver.execute_script(
+            "return window.__waBot ? window.__waBot.open(arguments[0], arguments[1]) : false;",
+            chat, unread_count))
+
+    def current_chat(self) -> Optional[str]:
+        """Title of the conversation on screen, or None if no chat is open"""
+        return self.driver.execute_script(
+            "var header = document.querySelector(arguments[0]);"
+            "return header ? header.getAttribute('title') : null;",
+            self.selectors['conversation_title'])
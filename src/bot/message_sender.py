@@ -0,0 +1,142 @@
+"""Fast message sending for WhatsApp Web.
+
+Instead of send_keys (one key event per character, so long help and
+report texts take seconds), the whole text is pasted into the compose
+box from JavaScript, the send button is clicked, and delivery is
+confirmed by waiting for a new outgoing bubble. A batch of messages for
+several chats is typed, sent and confirmed in a single
+execute_async_script call.
+"""
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .message_listener import SELECTORS
+
+SEND_BATCH_JS = r"""
+var batches = arguments[0];
+var selectors = arguments[1];
+var timeoutMs = arguments[2];
+var done = arguments[arguments.length - 1];
+
+function waitFor(check, timeout) {
+    return new Promise(function (resolve, reject) {
+        var started = Date.now();
+        (function tick() {
+            var value = null;
+            try { value = check(); } catch (e) {}
+            if (value) { resolve(value); return; }
+            if (Date.now() - started > timeout) { reject(new Error('timed out')); return; }
+            setTimeout(tick, 10);
+        })();
+    });
+}
+
+function conversationTitle() {
+    var header = document.querySelector(selectors.conversation_title);
+    return header ? header.getAttribute('title') : null;
+}
+
+function composeBox() {
+    return document.querySelector(selectors.compose);
+}
+
+function outgoingCount() {
+    return document.querySelectorAll(selectors.outgoing).length;
+}
+
+async function insertText(box, text) {
+    box.focus();
+    if (box.textContent) {
+        // Clear a half-typed draft so it is not sent along with the reply
+        document.execCommand('selectAll', false, null);
+        document.execCommand('delete', false, null);
+    }
+    // Paste keeps line breaks in WhatsApp's editor; fall back to insertText if it was ignored
+    var data = new DataTransfer();
+    data.setData('text/plain', text);
+    box.dispatchEvent(new ClipboardEvent('paste', {clipboardData: data, bubbles: true, cancelable: true}));
+    try {
+        await waitFor(function () { return box.textContent; }, 50);
+    } catch (e) {
+        document.execCommand('insertText', false, text);
+    }
+    if (!box.textContent) { throw new Error('compose box did not accept text'); }
+}
+
+async function sendOne(text) {
+    var box = await waitFor(composeBox, timeoutMs);
+    var before = outgoingCount();
+    await insertText(box, text);
+    var button = await waitFor(function () { return document.querySelector(selectors.send_button); }, timeoutMs);
+    button.click();
+    // Delivered to WhatsApp once the bubble is rendered and the compose box is empty again
+    try {
+        await waitFor(function () {
+            var current = composeBox();
+            return outgoingCount() > before && (!current || !current.textContent);
+        }, timeoutMs);
+    } catch (e) {
+        var error = new Error('sent but not confirmed');
+        error.unconfirmed = true;
+        throw error;
+    }
+}
+
+(async function () {
+    var results = [];
+    for (var i = 0; i < batches.length; i++) {
+        var batch = batches[i];
+        var result = {chat: batch.chat, sent: 0, error: null, unconfirmed: false, open_ms: 0, send_ms: 0};
+        var started = Date.now();
+        try {
+            if (batch.chat !== null && conversationTitle() !== batch.chat) {
+                if (!window.__waBot || !window.__waBot.open(batch.chat, batch.unread)) {
+                    throw new Error('chat ' + batch.chat + ' not found in chat list');
+                }
+                await waitFor(function () { return conversationTitle() === batch.chat; }, timeoutMs);
+            }
+            result.open_ms = Date.now() - started;
+            for (var j = 0; j < batch.texts.length; j++) {
+                await sendOne(batch.texts[j]);
+                result.sent += 1;
+            }
+        } catch (e) {
+            result.error = String((e && e.message) || e);
+            result.unconfirmed = Boolean(e && e.unconfirmed);
+        }
+        result.send_ms = Date.now() - started - result.open_ms;
+        results.push(result);
+    }
+    done(results);
+})();
+"""
+
+
+class MessageSender:
+    """Send messages by pasting text from JavaScript and confirming the outgoing bubble"""
+
+    def __init__(self, driver, selectors: Optional[Dict[str, str]] = None, timeout: float = 10):
+        self.driver = driver
+        self.selectors = dict(SELECTORS, **(selectors or {}))
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+
+    def send(self, text: str, chat: Optional[str] = None) -> Dict:
+        """Send one message to chat, or to the chat on screen when chat is None"""
+        return self.send_batch([(chat, 0, [text])])[0]
+
+    def send_batch(self, batches: Sequence[Tuple[Optional[str], int, List[str]]]) -> List[Dict]:
+        """Send several messages to several chats in one WebDriver round trip
+
+        Each batch is (chat, unread_count, texts); unread_count is passed to
+        the message listener so unread messages in a chat opened to reply
+        are still captured. Returns one result per batch with the number of
+        texts confirmed sent, an error message if it stopped early (with
+        unconfirmed set when the failing text was submitted but its bubble
+        never appeared, so it must not be resent), and the milliseconds
+        spent opening the chat and sending.
+        """
+        payload = [{'chat': chat, 'unread': unread, 'texts': list(texts)} for chat, unread, texts in batches]
+        steps = sum(len(batch['texts']) + 1 for batch in payload)
+        self.driver.set_script_timeout(self.timeout * steps + 5)
+        return self.driver.execute_async_script(SEND_BATCH_JS, payload, self.selectors, int(self.timeout * 1000))
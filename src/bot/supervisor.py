@@ -0,0 +1,189 @@
+"""Run several WhatsApp bot shards as separate processes.
+
+Each shard is its own process with its own Chrome profile (so its own
+WhatsApp account), remote debugging port, virtual display when
+WHATSAPP_USE_DISPLAY is set, and process group, so a shard can be stopped
+without touching its siblings. All shards share the same financial
+database but keep separate message ledgers. The supervisor watches a
+heartbeat each shard updates from its listener loop and restarts only the
+shard that died or stopped making progress, backing off if it keeps
+failing.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Dict, List, Optional
+
+from src.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _run_shard(shard_id: int, profile_dir: Optional[str], ledger_path: str, debug_port: int, heartbeat):
+    """Entry point of a shard process"""
+    # Own process group: Chrome and Xvfb started here can be stopped with the shard
+    os.setpgrp()
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL),
+                        format=f'%(asctime)s - shard {shard_id} - %(name)s - %(levelname)s - %(message)s')
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+
+    from src.bot.financial_processor import FinancialProcessor
+    from src.bot.whatsapp_handler import WhatsAppBot
+
+    def beat():
+        heartbeat.value = time.time()
+
+    processor = FinancialProcessor(Config.FINANCIAL_DB_PATH)
+    bot = WhatsAppBot(shard_id=shard_id, profile_dir=profile_dir, debug_port=debug_port, heartbeat=beat,
+                      processor=processor, ledger_path=ledger_path)
+    try:
+        bot.start()
+        bot.listen_for_messages()
+    except KeyboardInterrupt:
+        logging.getLogger(__name__).info(f"Shard {shard_id} stopping")
+    finally:
+        bot.cleanup()
+        processor.close()
+
+
+class BotSupervisor:
+    """Start, health-check and individually restart N bot processes"""
+
+    def __init__(self, shards: int, profile_root: Optional[str] = None, debug_port_base: int = 9222):
+        self.shards = shards
+        self.profile_root = profile_root if profile_root is not None else Config.WHATSAPP_PROFILE_DIR
+        self.debug_port_base = debug_port_base
+        # spawn gives every shard a clean interpreter instead of a fork of Flask and its threads
+        self._context = multiprocessing.get_context('spawn')
+        self._shards: Dict[int, Dict] = {}
+        self._stopping = threading.Event()
+        # run() and shutdown() may be on different threads; only one touches the shards at a time
+        self._lock = threading.Lock()
+
+    def _profile_dir(self, shard_id: int) -> Optional[str]:
+        # Without a profile root every shard gets a throwaway temp profile
+        return os.path.join(self.profile_root, f'shard-{shard_id}') if self.profile_root else None
+
+    @staticmethod
+    def _ledger_path(shard_id: int) -> str:
+        # Each shard resumes only its own unfinished messages, on its own account
+        root, ext = os.path.splitext(Config.WHATSAPP_LEDGER_PATH)
+        return f'{root}-shard-{shard_id}{ext}'
+
+    def _spawn(self, shard_id: int):
+        state = self._shards.setdefault(shard_id, {'restarts': 0, 'next_start': 0})
+        heartbeat = self._context.Value('d', 0.0, lock=False)
+        process = self._context.Process(
+            target=_run_shard,
+            args=(shard_id, self._profile_dir(shard_id), self._ledger_path(shard_id), self.debug_port_base + shard_id,
+                  heartbeat),
+            name=f'whatsapp-shard-{shard_id}',
+            daemon=True  # terminated with the application, which runs the shard's cleanup
+        )
+        process.start()
+        state.update(process=process, heartbeat=heartbeat, started_at=time.time())
+        logger.info(f"Started shard {shard_id} as PID {process.pid}")
+
+    def _stop(self, shard_id: int, timeout: float = 10):
+        """SIGTERM the shard so it can close Chrome itself, then SIGKILL its whole process group"""
+        process = self._shards[shard_id].get('process')
+        if process is None:
+            return
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout)
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        process.join(1)
+        self._shards[shard_id]['process'] = None
+
+    def check(self, shard_id: int) -> Optional[str]:
+        """Return why a shard is unhealthy, or None if it is fine"""
+        state = self._shards[shard_id]
+        process = state.get('process')
+        if process is None:
+            return "not running"
+        if not process.is_alive():
+            return f"exited with code {process.exitcode}"
+        now = time.time()
+        last_beat = state['heartbeat'].value
+        if not last_beat:
+            # Still starting up; a QR login can take a while
+            if now - state['started_at'] > Config.WHATSAPP_SHARD_STARTUP_TIMEOUT:
+                return f"no heartbeat within {Config.WHATSAPP_SHARD_STARTUP_TIMEOUT}s of starting"
+            return None
+        if now - last_beat > Config.WHATSAPP_SHARD_HEARTBEAT_TIMEOUT:
+            return f"no heartbeat for {now - last_beat:.0f}s"
+        return None
+
+    def _restart(self, shard_id: int, reason: str):
+        state = self._shards[shard_id]
+        if time.time() - state.get('started_at', 0) > Config.WHATSAPP_SHARD_STABLE_AFTER:
+            # It ran fine for a while, so this is a fresh failure rather than a crash loop
+            state['restarts'] = 0
+        delay = min(2 ** state['restarts'], 60)
+        logger.warning(f"Shard {shard_id} unhealthy ({reason}), restarting in {delay}s")
+        self._stop(shard_id)
+        state['restarts'] += 1
+        state['next_start'] = time.time() + delay
+
+    def status(self) -> List[Dict]:
+        """Per-shard PID, uptime, restart count, heartbeat age and health"""
+        now = time.time()
+        result = []
+        for shard_id, state in sorted(self._shards.items()):
+            process = state.get('process')
+            last_beat = state['heartbeat'].value if process else 0
+            result.append({
+                'shard': shard_id,
+                'pid': process.pid if process else None,
+                'uptime': now - state['started_at'] if process else 0,
+                'restarts': state['restarts'],
+                'heartbeat_age': now - last_beat if last_beat else None,
+                'problem': self.check(shard_id)
+            })
+        return result
+
+    def run(self):
+        """Start every shard and supervise them until stop(), shutdown() or Ctrl+C"""
+        with self._lock:
+            for shard_id in range(self.shards):
+                if not self._stopping.is_set():
+                    self._spawn(shard_id)
+        try:
+            while not self._stopping.wait(Config.WHATSAPP_SHARD_CHECK_INTERVAL):
+                with self._lock:
+                    for shard_id, state in self._shards.items():
+                        if self._stopping.is_set():
+                            break
+                        if state.get('process') is None:
+                            if time.time() >= state['next_start']:
+                                self._spawn(shard_id)
+                            continue
+                        problem = self.check(shard_id)
+                        if problem:
+                            self._restart(shard_id, problem)
+        except KeyboardInterrupt:
+            logger.info("Supervisor interrupted")
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self._stopping.set()
+
+    def shutdown(self):
+        """Stop every shard; safe to call from another thread while run() is supervising"""
+        self._stopping.set()
+        with self._lock:
+            for shard_id in list(self._shards):
+                self._stop(shard_id)
+        logger.info("All shards stopped")
@@ -4,24 +4,65 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from pyvirtualdisplay.display import Display
 import os
 import time
 import re
 import json
 import random
 import shutil
+import socket
 import tempfile
 import subprocess
 import base64
 import logging
+import queue
+import threading
+from collections import OrderedDict
 from datetime import datetime
+from .financial_processor import FinancialProcessor
 from .indonesian_commands import IndonesianCommands
+from .message_ledger import MessageLedger
+from .message_listener import MessageListener
+from .message_sender import MessageSender
+from src.utils.config import Config
+from src.utils.http_client import http_client
+from src.utils.metrics import metrics
+from src.utils.process_manager import ProcessManager, command_name, is_running
+from src.utils.timing import PhaseTimer, wait_until
 
 class WhatsAppBot:
-    def __init__(self):
+    def __init__(self, shard_id=None, profile_dir=None, debug_port=None, heartbeat=None, use_display=None,
+                 processor=None, ledger_path=None):
+        """Create a bot; the keyword arguments let a supervisor run several isolated instances
+
+        profile_dir overrides Config.WHATSAPP_PROFILE_DIR, debug_port pins
+        Chrome's remote debugging port, and heartbeat is called on every
+        listener tick so a supervisor can tell the bot is still making progress.
+        use_display overrides Config.WHATSAPP_USE_DISPLAY. processor is the
+        FinancialProcessor shared by every command; without one, a processor
+        on Config.FINANCIAL_DB_PATH is opened on first use and owned by the bot.
+        ledger_path overrides Config.WHATSAPP_LEDGER_PATH; bots on different
+        WhatsApp accounts need separate ledgers, or one would resume the
+        other's unfinished messages.
+        """
+        self.shard_id = shard_id
+        self.profile_root = profile_dir if profile_dir is not None else Config.WHATSAPP_PROFILE_DIR
+        self.use_display = use_display if use_display is not None else Config.WHATSAPP_USE_DISPLAY
+        self.display = None
+        self.debug_port = debug_port
+        self.heartbeat = heartbeat
+        self.processes = ProcessManager(f"shard {shard_id}" if shard_id is not None else "bot")
         self.driver = None
         self.wait = None
+        self.listener = None
+        self.sender = None
+        self.ledger = None
+        self.ledger_path = ledger_path or Config.WHATSAPP_LEDGER_PATH
+        self._processor = processor
+        self._processor_lock = threading.Lock()
+        self._request = threading.local()  # chat and user of the command a thread is running
+        self.workers = []
+        self._reset_pipeline_state()
         self.commands = {
             'expense': self.handle_expense,
             'income': self.handle_income,
@@ -36,120 +77,56 @@ class WhatsAppBot:
         }
         self.indonesian = IndonesianCommands()
         self.temp_dir = None
+        self.profile_dir = None
+        self.started_at = None
+        self.first_reply_pending = False
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
 
     def start(self):
         """Initialize the WhatsApp Web driver"""
-        # Clean up existing processes and create temp directory
+        timer = PhaseTimer('startup')
+        if not self.first_reply_pending:
+            # A crash restart has already started the clock
+            self.started_at = time.monotonic()
+            self.first_reply_pending = True
+        # Clean up our own leftover processes and create temp directory
         try:
-            # Clean up any existing processes more thoroughly
-            cleanup_commands = [
-                'pkill -f chrome',
-                'pkill -f chromedriver',
-                'pkill -f Xvfb',
-                'rm -rf /tmp/.X*-lock',
-                'rm -rf /tmp/.X11-unix/X*'
-            ]
-            for cmd in cleanup_commands:
-                try:
-                    subprocess.run(cmd.split(), stderr=subprocess.DEVNULL)
-                except:
-                    pass
-            time.sleep(2)
-
-            # Create unique temporary directory
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-            random_suffix = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz', k=6))
-            self.temp_dir = tempfile.mkdtemp(prefix=f'chrome_data_{timestamp}_{random_suffix}_')
-            os.chmod(self.temp_dir, 0o755)
-            self.logger.info(f"Created temporary directory: {self.temp_dir}")
-
-            # Initialize virtual display with simpler configuration
-            self.display = Display(visible=0, size=(1920, 1080))
-            self.display.start()
-            time.sleep(2)  # Wait for display to initialize
-
-            if not self.display.is_alive():
-                raise Exception("Failed to start virtual display")
-
-            # Set display environment variable
-            os.environ["DISPLAY"] = f":{self.display.display}"
-            self.logger.info(f"Virtual display started successfully on display :{self.display.display}")
+            # Only browsers this bot launched are stopped, so other bots and
+            # Chrome sessions on the same machine are left alone
+            self._terminate_browser_processes()
+            timer.mark('process_cleanup')
+
+            if self.profile_root:
+                # Persistent profile keeps the WhatsApp session and Chrome cache across restarts
+                self.profile_dir = os.path.abspath(self.profile_root)
+                os.makedirs(self.profile_dir, mode=0o700, exist_ok=True)
+                # The profile holds the WhatsApp session; keep it private even if it predates this
+                os.chmod(self.profile_dir, 0o700)
+                self._remove_stale_profile_locks()
+                self.logger.info(f"Using Chrome profile directory: {self.profile_dir}")
+            else:
+                # Create unique temporary directory
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+                random_suffix = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz', k=6))
+                self.temp_dir = tempfile.mkdtemp(prefix=f'chrome_data_{timestamp}_{random_suffix}_')
+                os.chmod(self.temp_dir, 0o755)
+                self.profile_dir = self.temp_dir
+                self.logger.info(f"Created temporary directory: {self.temp_dir}")
+
+            # Headless Chrome renders without an X server; Xvfb is only needed for a headed browser
+            if self.use_display:
+                self._start_display()
+                timer.mark('virtual_display')
 
         except Exception as e:
             self.logger.error(f"Error during initialization: {e}")
             self.cleanup()
             raise Exception(f"Initialization failed: {e}")
 
-        # Try to find browser binary
-        browser_paths = [
-            '/usr/bin/google-chrome',
-            '/usr/bin/google-chrome-stable',
-            '/usr/bin/chromium',
-            '/usr/bin/chromium-browser'
-        ]
-        
-        browser_found = None
-        for path in browser_paths:
-            if os.path.exists(path):
-                browser_found = path
-                self.logger.info(f"Found browser at: {path}")
-                break
-                
-        if not browser_found:
-            raise Exception("No compatible browser found. Please install Google Chrome or Chromium.")
+        options = self._chrome_options(self._find_browser())
+        timer.mark('chrome_options')
 
-        # Kill any existing Chrome processes
-        try:
-            subprocess.run(['pkill', '-f', '(chrome|chromedriver)'], shell=True, stderr=subprocess.DEVNULL)
-            time.sleep(2)
-        except Exception as e:
-            self.logger.warning(f"Error cleaning up Chrome processes: {e}")
-
-        # Verify display is ready
-        if "DISPLAY" not in os.environ:
-            raise Exception("Display environment variable not set")
-        
-        # Configure Chrome with debugging options
-        options = Options()
-        options.binary_location = browser_found
-
-        # Basic configuration with additional options for WhatsApp Web
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument(f'--user-data-dir={self.temp_dir}')
-        options.add_argument('--window-size=1920,1080')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--headless=new')
-        options.add_argument('--disable-extensions')
-        options.add_argument('--disable-software-rasterizer')
-        options.add_argument('--disable-setuid-sandbox')
-        options.add_argument(f'--display={os.environ["DISPLAY"]}')
-        options.add_argument('--disable-web-security')
-        options.add_argument('--allow-running-insecure-content')
-        options.add_argument('--ignore-certificate-errors')
-        options.add_argument('--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-        
-        # Add remote debugging port
-        debug_port = random.randint(9222, 9999)
-        options.add_argument(f'--remote-debugging-port={debug_port}')
-        self.logger.info(f"Using debug port {debug_port}")
-        
-        # Additional settings
-        options.add_experimental_option('excludeSwitches', ['enable-automation', 'enable-logging'])
-        options.add_experimental_option('useAutomationExtension', False)
-        options.add_experimental_option('prefs', {
-            'profile.default_content_setting_values.notifications': 2,
-            'profile.default_content_settings.popups': 0,
-            'download.prompt_for_download': False,
-            'credentials_enable_service': False,
-            'profile.password_manager_enabled': False
-        })
-
-        # Wait for display to be ready
-        time.sleep(2)
-        
         # Set up Chrome driver service
         try:
             # Use chromedriver from the extracted archive
@@ -163,7 +140,7 @@ class WhatsAppBot:
             # Set up service with specific configuration
             service = Service(
                 executable_path=chromedriver_path,
-                log_path=os.path.join(self.temp_dir, 'chromedriver.log'),
+                log_path=os.path.join(self.profile_dir, 'chromedriver.log'),
                 service_args=['--verbose']
             )
             
@@ -174,15 +151,16 @@ class WhatsAppBot:
                 try:
                     self.driver = webdriver.Chrome(service=service, options=options)
                     self.logger.info("Chrome driver initialized successfully")
+                    self._track_browser_processes()
                     
                     # Set page load timeout and wait with increased timeouts
                     self.driver.set_page_load_timeout(60)
                     self.wait = WebDriverWait(self.driver, 30)
                     
-                    # Test browser is working
+                    # Test browser is working; get() returns once the page has loaded
                     self.driver.get('about:blank')
-                    time.sleep(2)
                     self.logger.info("Chrome browser test page loaded successfully")
+                    timer.mark('chrome_launch')
                     break  # Success, exit the retry loop
                     
                 except Exception as e:
@@ -195,7 +173,8 @@ class WhatsAppBot:
                             pass
                     if retry_count >= max_retries:
                         raise Exception(f"Chrome driver initialization failed after {max_retries} attempts: {str(e)}")
-                    time.sleep(2)  # Wait before retrying
+                    # Retry once the failed browser has actually gone away
+                    self._terminate_browser_processes()
             
             # Load WhatsApp Web with retry
             max_retries = 3
@@ -209,89 +188,44 @@ class WhatsAppBot:
                     # Navigate to WhatsApp Web
                     self.logger.info("Navigating to WhatsApp Web...")
                     self.driver.get("https://web.whatsapp.com")
-                    time.sleep(5)  # Wait for initial page load
+                    timer.mark('page_load')
                     
-                    # Wait for page to be ready
-                    self.logger.info("Waiting for page to be ready...")
-                    self.wait.until(
-                        EC.presence_of_element_located((By.TAG_NAME, "body"))
-                    )
-                    
-                    # Wait for QR code with multiple selectors
-                    self.logger.info("Waiting for QR code...")
                     qr_selectors = [
                         "canvas[aria-label='Scan me!']",
                         "canvas[data-testid='qrcode']",
                         "canvas.qr-code"
                     ]
-                    
-                    qr_canvas = None
-                    for selector in qr_selectors:
-                        try:
-                            qr_canvas = self.wait.until(
-                                EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                            )
-                            self.logger.info(f"QR code found with selector: {selector}")
-                            break
-                        except:
-                            continue
-                    
-                    if not qr_canvas:
-                        raise Exception("Could not find QR code element with any known selector")
-                    
-                    # Get and save QR code image with error handling
-                    try:
-                        self.logger.info("Capturing QR code image...")
-                        qr_base64 = self.driver.execute_script(
-                            "return arguments[0].toDataURL('image/png').substring(21);", 
-                            qr_canvas
-                        )
-                        
-                        # Verify base64 data
-                        if not qr_base64:
-                            raise Exception("Failed to get QR code image data")
-                        
-                        # Save QR code image with error handling
-                        qr_path = os.path.join(self.temp_dir, "qr_code.png")
-                        try:
-                            with open(qr_path, "wb") as f:
-                                f.write(base64.b64decode(qr_base64))
-                            
-                            # Verify file was created
-                            if not os.path.exists(qr_path) or os.path.getsize(qr_path) == 0:
-                                raise Exception("QR code image file is empty or not created")
-                                
-                            self.logger.info(f"QR code saved successfully to: {qr_path}")
-                            print(f"\nPlease scan the QR code saved at: {qr_path}\n")
-                            
-                        except Exception as save_error:
-                            raise Exception(f"Failed to save QR code image: {str(save_error)}")
-                            
-                    except Exception as qr_error:
-                        raise Exception(f"Failed to capture QR code: {str(qr_error)}")
-                    
-                    # Wait for login with multiple indicators
-                    self.logger.info("Waiting for WhatsApp Web login...")
                     login_selectors = [
                         "div[data-testid='chat-list']",
                         "div._3YewW",  # Alternative chat list selector
                         "div[data-testid='default-user']"  # User profile indicator
                     ]
                     
-                    login_success = False
-                    for selector in login_selectors:
+                    # A saved session goes straight to the chat list, so wait for whichever appears first
+                    self.logger.info("Waiting for QR code or chat list...")
+                    try:
+                        first_screen = self.wait.until(
+                            EC.presence_of_element_located((By.CSS_SELECTOR, ", ".join(qr_selectors + login_selectors)))
+                        )
+                    except Exception:
+                        raise Exception("Could not find QR code or chat list with any known selector")
+                    
+                    if first_screen.tag_name.lower() != 'canvas':
+                        self.logger.info(f"Reusing saved WhatsApp session from {self.profile_dir}, skipping QR login")
+                        timer.mark('session_restore')
+                    else:
+                        timer.mark('qr_render')
+                        self._save_qr_code(first_screen)
+                        
+                        # Wait for login with multiple indicators
+                        self.logger.info("Waiting for WhatsApp Web login...")
                         try:
                             self.wait.until(
-                                EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+                                EC.presence_of_element_located((By.CSS_SELECTOR, ", ".join(login_selectors)))
                             )
-                            self.logger.info(f"Login detected via selector: {selector}")
-                            login_success = True
-                            break
-                        except:
-                            continue
-                    
-                    if not login_success:
-                        raise Exception("Could not detect successful login with any known indicator")
+                        except Exception:
+                            raise Exception("Could not detect successful login with any known indicator")
+                        timer.mark('login')
                     
                     # Additional verification
                     try:
@@ -302,6 +236,11 @@ class WhatsAppBot:
                         self.logger.warning("Could not verify WhatsApp Web interface state")
                     
                     self.logger.info("Successfully logged into WhatsApp Web")
+                    
+                    # Prefetch market data so 'pasar' and 'rencana' answer from memory
+                    from src.utils.market_data import market_data
+                    market_data.warm_up()
+                    self.logger.info(timer.report("Startup"))
                     break  # Success, exit the retry loop
                     
                 except Exception as e:
@@ -346,108 +285,525 @@ class WhatsAppBot:
             raise Exception(error_msg)
         
 
+    def _start_display(self):
+        """Start the Xvfb virtual display a headed Chrome draws on"""
+        from pyvirtualdisplay.display import Display
+
+        self.display = Display(visible=0, size=(1920, 1080))
+        self.display.start()
+
+        # Ready once the X server is running and has created its socket
+        try:
+            wait_until(lambda: self.display.is_alive() and
+                       os.path.exists(f'/tmp/.X11-unix/X{self.display.display}'),
+                       timeout=10, message="virtual display")
+        except TimeoutError:
+            raise Exception("Failed to start virtual display")
+
+        # Set display environment variable
+        os.environ["DISPLAY"] = f":{self.display.display}"
+        self._track_display()
+        self.logger.info(f"Virtual display started successfully on display :{self.display.display}")
+
+    def _find_browser(self):
+        """Path of the first Chrome or Chromium binary found"""
+        browser_paths = [
+            '/usr/bin/google-chrome',
+            '/usr/bin/google-chrome-stable',
+            '/usr/bin/chromium',
+            '/usr/bin/chromium-browser'
+        ]
+        
+        browser_found = None
+        for path in browser_paths:
+            if os.path.exists(path):
+                browser_found = path
+                self.logger.info(f"Found browser at: {path}")
+                break
+                
+        if not browser_found:
+            raise Exception("No compatible browser found. Please install Google Chrome or Chromium.")
+        return browser_found
+
+    def _chrome_options(self, browser_path):
+        """Chrome options for WhatsApp Web: headless unless the bot runs on a virtual display"""
+        # Configure Chrome with debugging options
+        options = Options()
+        options.binary_location = browser_path
+
+        # Basic configuration with additional options for WhatsApp Web
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument(f'--user-data-dir={self.profile_dir}')
+        options.add_argument('--window-size=1920,1080')
+        options.add_argument('--disable-gpu')
+        if self.display:
+            options.add_argument(f'--display={os.environ["DISPLAY"]}')
+        else:
+            options.add_argument('--headless=new')
+        options.add_argument('--disable-extensions')
+        options.add_argument('--disable-software-rasterizer')
+        options.add_argument('--disable-setuid-sandbox')
+        options.add_argument('--disable-web-security')
+        options.add_argument('--allow-running-insecure-content')
+        options.add_argument('--ignore-certificate-errors')
+        options.add_argument('--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+        
+        # Add remote debugging port
+        debug_port = self.debug_port or random.randint(9222, 9999)
+        options.add_argument(f'--remote-debugging-port={debug_port}')
+        self.logger.info(f"Using debug port {debug_port}")
+        
+        # Additional settings
+        options.add_experimental_option('excludeSwitches', ['enable-automation', 'enable-logging'])
+        options.add_experimental_option('useAutomationExtension', False)
+        options.add_experimental_option('prefs', {
+            'profile.default_content_setting_values.notifications': 2,
+            'profile.default_content_settings.popups': 0,
+            'download.prompt_for_download': False,
+            'credentials_enable_service': False,
+            'profile.password_manager_enabled': False
+        })
+        return options
+
+    def _track_display(self):
+        """Remember the PID of the Xvfb server behind the virtual display"""
+        # pyvirtualdisplay keeps the Popen of the server on its backend object
+        process = getattr(getattr(self.display, '_obj', None), '_subproc', None)
+        if process is not None:
+            self.processes.track(process.pid, 'xvfb')
+
+    def _track_browser_processes(self):
+        """Remember chromedriver and, as they appear, every Chrome process it starts"""
+        try:
+            driver_pid = self.driver.service.process.pid
+        except AttributeError:
+            return
+        self.processes.track(driver_pid, 'chromedriver', include_children=True)
+        self.logger.info(f"Tracking browser processes {self.processes.pids('chromedriver', 'chrome')}")
+
+    def _terminate_browser_processes(self, include_display=False):
+        """Stop the browser processes this bot started, killing any that ignore SIGTERM"""
+        roles = ('chromedriver', 'chrome', 'xvfb') if include_display else ('chromedriver', 'chrome')
+        self.processes.refresh()
+        pids = self.processes.pids(*roles)
+        if not pids:
+            return
+        result = self.processes.terminate(pids, timeout=Config.WHATSAPP_PROCESS_STOP_TIMEOUT)
+        self.logger.info(f"Stopped {len(pids)} browser processes "
+                         f"({result['terminated']} exited, {result['killed']} killed)")
+
+    def _remove_stale_profile_locks(self):
+        """Delete Chrome's singleton lock files left behind by a crashed browser
+
+        Chrome refuses to open a profile whose lock points at a dead process.
+        The lock is a 'hostname-pid' symlink. It is only removed when that
+        process is gone or ran on another host; a Chrome still running on the
+        profile here was not started by this bot (our own were stopped
+        already), so it is left alone and the bot refuses to start.
+        """
+        lock = os.path.join(self.profile_dir, 'SingletonLock')
+        try:
+            owner_host, owner_pid = os.readlink(lock).rsplit('-', 1)
+            owner_pid = int(owner_pid)
+        except (OSError, ValueError):
+            owner_host, owner_pid = None, None
+        if owner_pid and owner_host == socket.gethostname() and is_running(owner_pid):
+            # After a reboot the PID may belong to an unrelated process by now
+            name = command_name(owner_pid)
+            if name and 'chrom' in name:
+                raise RuntimeError(f"Chrome process {owner_pid} ({name}) is already using profile "
+                                   f"{self.profile_dir}; stop it or give this bot another WHATSAPP_PROFILE_DIR")
+        for name in ('SingletonLock', 'SingletonSocket', 'SingletonCookie'):
+            path = os.path.join(self.profile_dir, name)
+            if os.path.lexists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    self.logger.warning(f"Could not remove stale profile lock {path}: {e}")
+
+    def _save_qr_code(self, qr_canvas):
+        """Save the login QR code as a PNG next to the Chrome profile and tell the user where it is"""
+        try:
+            self.logger.info("Capturing QR code image...")
+            qr_base64 = self.driver.execute_script(
+                "return arguments[0].toDataURL('image/png').substring(21);", 
+                qr_canvas
+            )
+            
+            # Verify base64 data
+            if not qr_base64:
+                raise Exception("Failed to get QR code image data")
+            
+            # Save QR code image with error handling
+            qr_path = os.path.join(self.profile_dir, "qr_code.png")
+            try:
+                with open(qr_path, "wb") as f:
+                    f.write(base64.b64decode(qr_base64))
+                
+                # Verify file was created
+                if not os.path.exists(qr_path) or os.path.getsize(qr_path) == 0:
+                    raise Exception("QR code image file is empty or not created")
+                    
+                self.logger.info(f"QR code saved successfully to: {qr_path}")
+                print(f"\nPlease scan the QR code saved at: {qr_path}\n")
+                
+            except Exception as save_error:
+                raise Exception(f"Failed to save QR code image: {str(save_error)}")
+                
+        except Exception as qr_error:
+            raise Exception(f"Failed to capture QR code: {str(qr_error)}")
+
     def listen_for_messages(self):
-        """Listen for incoming messages and process them"""
+        """Listen for incoming messages and process them
+
+        The bot runs as three stages. The driver thread scrapes new messages
+        into a bounded job queue and sends finished replies; a pool of worker
+        threads runs the command handlers in between, so a slow command only
+        occupies one worker instead of stalling every chat. WebDriver is not
+        thread-safe, which is why scraping and sending share one thread.
+        """
         retry_count = 0
-        max_retries = 3
         retry_delay = 2
-        max_consecutive_errors = 5
-        consecutive_errors = 0
+        last_report = time.monotonic()
 
-        while True:
-            try:
-                # Check if driver is alive
-                if not self.is_driver_alive():
-                    raise Exception("Chrome driver is not responsive")
+        self._reset_pipeline_state()
+        if self.ledger is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.ledger_path)), exist_ok=True)
+            self.ledger = MessageLedger(self.ledger_path, Config.WHATSAPP_LEDGER_CACHE_SIZE)
+            self.ledger.prune(Config.WHATSAPP_LEDGER_RETENTION_DAYS)
+            self.processor.prune_applied_messages(Config.WHATSAPP_LEDGER_RETENTION_DAYS)
+        self._start_workers()
+        self._recover_unfinished()
+        self.listener = MessageListener(self.driver)
+        self.listener.install()
+        self.sender = MessageSender(self.driver, timeout=Config.WHATSAPP_SEND_TIMEOUT)
 
-                # Find unread messages with timeout and retry
+        try:
+            while True:
                 try:
-                    self.logger.debug("Checking for unread messages...")
-                    unread = self.wait.until(EC.presence_of_all_elements_located(
-                        (By.CSS_SELECTOR, 'span[aria-label="UNREAD"]')))
-                    retry_count = 0  # Reset retry count on success
-                    consecutive_errors = 0  # Reset error count on success
+                    # Check if driver is alive
+                    if not self.is_driver_alive():
+                        raise Exception("Chrome driver is not responsive")
+                    if self.heartbeat:
+                        self.heartbeat()
+
+                    # Replies are only sent while no opened chat is still loading its messages,
+                    # otherwise switching chats would lose them
+                    if self.awaiting_chat is None:
+                        self._send_replies()
+
+                    if self.jobs.full() and self.awaiting_chat is None:
+                        # Backpressure: leave new messages queued in the page until a worker frees up
+                        metrics.increment('scraper.backpressure_pauses')
+                        self._wait_for_reply(0.5)
+                    else:
+                        self._scrape()
+                    retry_count = 0
+
+                    if time.monotonic() - last_report >= Config.WHATSAPP_METRICS_INTERVAL:
+                        self.log_pipeline_metrics()
+                        last_report = time.monotonic()
+
                 except Exception as e:
+                    error_msg = str(e)
+                    self.logger.error(f"Critical error in message listener: {error_msg}")
+                    
+                    # Handle different error scenarios
+                    if "chrome not reachable" in error_msg.lower() or "not responsive" in error_msg.lower():
+                        self.logger.error("Chrome driver appears to be dead, attempting restart...")
+                        # Restart-to-first-reply is measured from here
+                        self.started_at = time.monotonic()
+                        self.first_reply_pending = True
+                        self.cleanup()
+                        try:
+                            self.start()
+                            self._reset_pipeline_state(keep_queues=True)
+                            self.listener = MessageListener(self.driver)
+                            self.listener.install()
+                            self.sender = MessageSender(self.driver, timeout=Config.WHATSAPP_SEND_TIMEOUT)
+                            self.logger.info("Successfully restarted WhatsApp bot")
+                            retry_count = 0
+                            continue
+                        except Exception as restart_error:
+                            self.logger.error(f"Failed to restart WhatsApp bot: {str(restart_error)}")
+                            raise
+                    
+                    # Progressive delay with jitter
+                    delay = min(retry_delay * (2 ** retry_count) + random.uniform(0, 2), 30)
                     retry_count += 1
-                    consecutive_errors += 1
-                    if retry_count >= max_retries:
-                        self.logger.error(f"Failed to find unread messages after {max_retries} attempts: {str(e)}")
-                        raise
-                    if consecutive_errors >= max_consecutive_errors:
-                        self.logger.error(f"Too many consecutive errors ({consecutive_errors}), restarting bot...")
-                        raise Exception("Too many consecutive errors")
-                    self.logger.warning(f"Retry {retry_count}/{max_retries} finding unread messages: {str(e)}")
-                    time.sleep(retry_delay)
-                    continue
-
-                # Process each unread message
-                for message in unread:
-                    try:
-                        # Click on the chat with retry
-                        click_success = False
-                        for attempt in range(3):
-                            try:
-                                message.click()
-                                click_success = True
-                                break
-                            except Exception as click_error:
-                                self.logger.warning(f"Click attempt {attempt + 1} failed: {str(click_error)}")
-                                time.sleep(1)
-                        
-                        if not click_success:
-                            raise Exception("Failed to click chat after multiple attempts")
+                    self.logger.info(f"Waiting {delay:.1f} seconds before retry...")
+                    time.sleep(delay)
+        finally:
+            self._stop_workers()
 
-                        # Wait for messages to load and verify
-                        time.sleep(1)
-                        messages = self.wait.until(EC.presence_of_all_elements_located(
-                            (By.CSS_SELECTOR, 'div.message-in')))
-                        
-                        if not messages:
-                            self.logger.warning("No incoming messages found after clicking chat")
-                            continue
-                        
-                        # Get and verify last message
-                        last_message = messages[-1].text
-                        if not last_message:
-                            self.logger.warning("Last message text is empty")
-                            continue
-                        
-                        # Process message with logging
-                        self.logger.info(f"Processing message: {last_message[:50]}...")
-                        self.process_message(last_message)
-                        
-                        # Ensure message is marked as read
-                        time.sleep(1)
-                        
-                    except Exception as message_error:
-                        self.logger.error(f"Error processing individual message: {str(message_error)}")
-                        consecutive_errors += 1
-                        if consecutive_errors >= max_consecutive_errors:
-                            raise Exception("Too many consecutive message processing errors")
-                        continue
-                
-            except Exception as e:
-                error_msg = str(e)
-                self.logger.error(f"Critical error in message listener: {error_msg}")
-                
-                # Handle different error scenarios
-                if "chrome not reachable" in error_msg.lower() or "not responsive" in error_msg.lower():
-                    self.logger.error("Chrome driver appears to be dead, attempting restart...")
-                    self.cleanup()
-                    try:
-                        self.start()
-                        self.logger.info("Successfully restarted WhatsApp bot")
-                        retry_count = 0
-                        consecutive_errors = 0
-                        continue
-                    except Exception as restart_error:
-                        self.logger.error(f"Failed to restart WhatsApp bot: {str(restart_error)}")
-                        raise
-                
-                # Progressive delay with jitter
-                delay = min(retry_delay * (2 ** retry_count) + random.uniform(0, 2), 30)
-                self.logger.info(f"Waiting {delay:.1f} seconds before retry...")
-                time.sleep(delay)
+    def _reset_pipeline_state(self, keep_queues=False):
+        """Forget which chats are pending; optionally keep queued jobs and replies across a restart"""
+        self.pending_chats = OrderedDict()  # chat title -> unread count, in arrival order
+        self.awaiting_chat = None
+        self.awaiting_since = 0
+        if not keep_queues:
+            self.jobs = queue.Queue(maxsize=Config.WHATSAPP_JOB_QUEUE_SIZE)
+            self.replies = queue.Queue()
+            self.in_flight = 0
+
+    def _scrape(self):
+        """Scraper stage: drain listener events, queue jobs and open the next unread chat"""
+        # Poll briefly while replies are outstanding so they are not held back by an idle page
+        if (self.pending_chats and self.awaiting_chat is None) or not self.replies.empty():
+            timeout = 0
+        elif self.in_flight:
+            timeout = 0.2
+        else:
+            timeout = Config.WHATSAPP_POLL_TIMEOUT
+
+        started = time.perf_counter()
+        events = self.listener.poll(timeout)
+        metrics.observe('scraper.poll', time.perf_counter() - started)
+
+        for event in events:
+            if event['type'] == 'unread':
+                if event['chat'] != self.awaiting_chat:
+                    self.pending_chats[event['chat']] = event['count']
+                continue
+
+            if event['chat'] == self.awaiting_chat:
+                self.awaiting_chat = None
+            self.pending_chats.pop(event['chat'], None)
+
+            if not event['text']:
+                self.logger.warning("Incoming message text is empty")
+                continue
+            sender, in_group = event.get('sender'), bool(event.get('group'))
+            ledger_key = self.ledger.claim(event['chat'], event['id'], event['text'], sender, in_group)
+            if ledger_key is None:
+                metrics.increment('ledger.duplicates')
+                self.logger.info(f"Skipping already processed message from {event['chat']}")
+                continue
+            self._enqueue(event['chat'], event['text'], event['at'] / 1000.0, ledger_key, sender, in_group)
+
+        if self.awaiting_chat is not None and time.monotonic() - self.awaiting_since > Config.WHATSAPP_OPEN_CHAT_TIMEOUT:
+            self.logger.warning(f"No messages arrived after opening chat {self.awaiting_chat}")
+            self.awaiting_chat = None
+
+        # Open the next unread chat only once the previous one has delivered its messages
+        if self.awaiting_chat is None and self.pending_chats:
+            chat, count = self.pending_chats.popitem(last=False)
+            if self.listener.open_chat(chat, count):
+                self.awaiting_chat = chat
+                self.awaiting_since = time.monotonic()
+            else:
+                self.logger.warning(f"Chat {chat} not found in chat list")
+
+    def _enqueue(self, chat_id, message, seen_at, ledger_key, sender=None, in_group=False):
+        """Hand a message to the worker pool, blocking while the job queue is full"""
+        capture = max(time.time() - seen_at, 0)
+        metrics.observe('scraper.capture', capture)
+        job = {'chat_id': chat_id, 'sender': sender, 'in_group': in_group, 'message': message,
+               'seen_at': seen_at, 'capture': capture, 'queued_at': time.monotonic(), 'ledger_key': ledger_key}
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            metrics.increment('scraper.backpressure_blocks')
+            started = time.perf_counter()
+            self.jobs.put(job)
+            metrics.observe('scraper.blocked', time.perf_counter() - started)
+        self.in_flight += 1
+        metrics.gauge('jobs.depth', self.jobs.qsize())
+        self.logger.info(f"Queued message from {chat_id} ({sender}): {message[:50]}...")
+
+    def _recover_unfinished(self):
+        """Requeue what a previous run claimed but did not finish
+
+        Pending messages go back to the workers; handled ones already ran
+        their command, so only the stored reply is sent again.
+        """
+        now = time.monotonic()
+        for entry in self.ledger.unfinished():
+            job = {'chat_id': entry['chat'], 'sender': entry['sender'], 'in_group': entry['in_group'],
+                   'message': entry['message'],
+                   'seen_at': entry['updated_at'], 'capture': 0, 'queued_at': now, 'ledger_key': entry['key']}
+            if entry['status'] == 'handled':
+                job.update(reply=entry['reply'], started_at=now, replied_at=now)
+                self.replies.put(job)
+            else:
+                self.jobs.put(job)
+            self.in_flight += 1
+            metrics.increment('ledger.recovered')
+            self.logger.info(f"Recovered {entry['status']} message from {entry['chat']}")
+
+    def _start_workers(self):
+        """Start the worker stage if it is not already running"""
+        if self.workers:
+            return
+        for index in range(Config.WHATSAPP_WORKERS):
+            worker = threading.Thread(target=self._run_worker, name=f'whatsapp-worker-{index}', daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def _stop_workers(self):
+        for _ in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.join(timeout=5)
+        self.workers = []
+
+    def _run_worker(self):
+        """Worker stage: run command handlers and pass replies to the sender"""
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            started_at = time.monotonic()
+            metrics.observe('worker.queue_wait', started_at - job['queued_at'])
+            metrics.gauge('jobs.depth', self.jobs.qsize())
+            reply = self.build_reply(job['message'], job['chat_id'], job.get('sender'), job['ledger_key'],
+                                     job.get('in_group', False))
+            self.ledger.mark_handled(job['ledger_key'], reply)
+            job.update(reply=reply, started_at=started_at, replied_at=time.monotonic())
+            metrics.observe('worker.handler', job['replied_at'] - started_at)
+            self.replies.put(job)
+            metrics.gauge('replies.depth', self.replies.qsize())
+
+    def _wait_for_reply(self, timeout):
+        """Block until a worker produces a reply or the timeout passes"""
+        try:
+            job = self.replies.get(timeout=timeout)
+        except queue.Empty:
+            return
+        self._send_reply(job)
+
+    def _send_replies(self):
+        """Sender stage: deliver every finished reply, switching chats as needed
+
+        Replies are grouped per chat, starting with the chat on screen, and
+        the whole batch goes out in one WebDriver call; any reply the fast
+        path could not confirm is retried on its own.
+        """
+        jobs = []
+        while True:
+            try:
+                jobs.append(self.replies.get_nowait())
+            except queue.Empty:
+                break
+        if not jobs:
+            return
+
+        by_chat = OrderedDict()
+        current = self.listener.current_chat()
+        if any(job['chat_id'] == current for job in jobs):
+            by_chat[current] = []
+        for job in jobs:
+            by_chat.setdefault(job['chat_id'], []).append(job)
+
+        batches = [(chat, self.pending_chats.pop(chat, 0), [job['reply'] for job in chat_jobs])
+                   for chat, chat_jobs in by_chat.items()]
+        try:
+            results = self.sender.send_batch(batches)
+        except Exception as e:
+            self.logger.warning(f"Batched send failed, sending replies one by one: {str(e)}")
+            results = [{'sent': 0, 'open_ms': 0, 'send_ms': 0, 'error': str(e), 'unconfirmed': False}
+                       for _ in batches]
+        metrics.increment('sender.batches')
+        metrics.increment('sender.batch_messages', len(jobs))
+
+        for (chat, chat_jobs), result in zip(by_chat.items(), results):
+            if result['error']:
+                self.logger.warning(f"Fast send to {chat} stopped after {result['sent']} of "
+                                    f"{len(chat_jobs)} replies: {result['error']}")
+            per_reply = result['send_ms'] / 1000 / max(result['sent'], 1)
+            for index, job in enumerate(chat_jobs):
+                if index < result['sent']:
+                    phases = [('reply_wait', time.monotonic() - job['replied_at']),
+                              ('open_chat', result['open_ms'] / 1000 if index == 0 else 0),
+                              ('send', per_reply)]
+                    for name, seconds in phases:
+                        metrics.observe(f'sender.{name}', seconds)
+                    self._finish_reply(job, phases, True)
+                elif index == result['sent'] and result['unconfirmed']:
+                    # Submitted but never confirmed; resending could duplicate it
+                    self._finish_reply(job, [], False)
+                else:
+                    self._send_reply(job)
+
+    def _send_reply(self, job):
+        """Send a single reply, falling back to typing it if the fast path fails"""
+        timer = PhaseTimer('sender')
+        timer.record('reply_wait', time.monotonic() - job['replied_at'])
+        sent = False
+        try:
+            chat = job['chat_id']
+            if self.listener.current_chat() != chat:
+                # Unread messages in that chat are captured as it opens
+                if not self.listener.open_chat(chat, self.pending_chats.pop(chat, 0)):
+                    raise Exception(f"Chat {chat} not found in chat list")
+                wait_until(lambda: self.listener.current_chat() == chat,
+                           timeout=Config.WHATSAPP_OPEN_CHAT_TIMEOUT, message=f"chat {chat} to open")
+                timer.mark('open_chat')
+            self.send_message(job['reply'])
+            timer.mark('send')
+            sent = True
+        except Exception as e:
+            self.logger.error(f"Failed to send reply to {job['chat_id']}: {str(e)}")
+        finally:
+            self._finish_reply(job, timer.phases, sent)
+
+    def _finish_reply(self, job, phases, sent):
+        """Record metrics and the timing report for a reply that was sent or given up on"""
+        self.in_flight -= 1
+        if not sent:
+            metrics.increment('sender.failed')
+        else:
+            metrics.increment('sender.sent')
+            self.ledger.mark_replied(job['ledger_key'])
+            if self.first_reply_pending:
+                self.first_reply_pending = False
+                elapsed = time.monotonic() - self.started_at
+                metrics.observe('startup.to_first_reply', elapsed)
+                self.logger.info(f"First reply sent {elapsed:.2f}s after start")
+        end_to_end = max(time.time() - job['seen_at'], 0)
+        metrics.observe('pipeline.end_to_end', end_to_end)
+        self._log_message_timing(job, phases, end_to_end)
+
+    def _log_message_timing(self, job, sender_phases, end_to_end):
+        """Per-message breakdown of where the wall-clock time between arrival and reply went"""
+        phases = [
+            ('capture', job['capture']),
+            ('queue_wait', job['started_at'] - job['queued_at']),
+            ('handler', job['replied_at'] - job['started_at'])
+        ] + list(sender_phases)
+        breakdown = " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in phases)
+        self.logger.info(f"Reply to {job['chat_id']} took {end_to_end * 1000:.0f}ms: {breakdown}")
+
+    def pipeline_metrics(self):
+        """Backpressure counters, queue depths and per-stage latency histograms"""
+        snapshot = metrics.snapshot()
+        snapshot['gauges']['jobs.in_flight'] = self.in_flight
+        return snapshot
+
+    def browser_usage(self):
+        """Memory and CPU of this bot's chromedriver, Chrome and Xvfb processes, also kept as gauges"""
+        usage = self.processes.usage()
+        for role, stats in usage.items():
+            metrics.gauge(f"browser.{role}.rss_mb", round(stats['rss_mb'], 1))
+            metrics.gauge(f"browser.{role}.cpu_percent", round(stats['cpu_percent'], 1))
+            metrics.gauge(f"browser.{role}.processes", stats['processes'])
+        return usage
+
+    def log_pipeline_metrics(self):
+        usage = self.browser_usage()
+        snapshot = self.pipeline_metrics()
+        for name, stats in sorted(snapshot['histograms'].items()):
+            self.logger.info(f"{name}: n={stats['count']} p50={stats['p50_ms']:.0f}ms "
+                             f"p95={stats['p95_ms']:.0f}ms max={stats['max_ms']:.0f}ms")
+        self.logger.info(f"Queues: {snapshot['gauges']} counters: {snapshot['counters']}")
+        for role, stats in sorted(usage.items()):
+            self.logger.info(f"{role}: {stats['processes']} processes rss={stats['rss_mb']:.0f}MB "
+                             f"cpu={stats['cpu_percent']:.0f}%")
+        for host, stats in sorted(http_client.metrics().items()):
+            self.logger.info(f"http {host}: n={stats['requests']} errors={stats['errors']} "
+                             f"retries={stats['retries']} p50={stats['p50_ms']:.0f}ms "
+                             f"p95={stats['p95_ms']:.0f}ms max={stats['max_ms']:.0f}ms")
 
     def is_driver_alive(self):
         """Check if the Chrome driver is still responsive"""
@@ -457,8 +813,48 @@ class WhatsAppBot:
         except:
             return False
 
-    def process_message(self, message):
-        """Process incoming messages and execute commands"""
+    @property
+    def processor(self):
+        """The FinancialProcessor every command uses, opened once"""
+        if self._processor is None:
+            with self._processor_lock:
+                if self._processor is None:
+                    self._processor = FinancialProcessor(Config.FINANCIAL_DB_PATH)
+        return self._processor
+
+    def _user_id(self):
+        """user_id of the sender whose command the calling thread is running"""
+        user_id = getattr(self._request, 'user_id', None)
+        if user_id is None:
+            chat_id = getattr(self._request, 'chat_id', None)
+            sender = getattr(self._request, 'sender', None)
+            if sender:
+                # A group's title names the group, not the member who sent the command
+                label = None if getattr(self._request, 'in_group', False) else chat_id
+                user_id = self.processor.get_user_id(sender, label=label)
+            elif chat_id:
+                # Only bubbles without a data-id lack a JID; fall back to the title
+                user_id = self.processor.get_user_id(chat_id)
+            else:
+                user_id = Config.WHATSAPP_DEFAULT_USER_ID
+            self._request.user_id = user_id
+        return user_id
+
+    def _message_key(self):
+        """Ledger key of the message whose command the calling thread is running, if any"""
+        return getattr(self._request, 'message_key', None)
+
+    def build_reply(self, message, chat_id=None, sender=None, message_key=None, in_group=False):
+        """Run the command in a message from chat_id (sent by JID sender) and return the reply text
+
+        message_key is the message's ledger key; commands that record
+        transactions or goals pass it on so a replay cannot apply them twice.
+        """
+        self._request.chat_id = chat_id
+        self._request.sender = sender
+        self._request.in_group = in_group
+        self._request.message_key = message_key
+        self._request.user_id = None
         try:
             self.logger.info(f"Processing message: {message}")
             # Try to translate Indonesian command to English
@@ -466,18 +862,43 @@ class WhatsAppBot:
             
             if command and command in self.commands:
                 self.logger.info(f"Executing command: {command} with params: {params}")
-                response = self.commands[command](*params)
-                self.send_message(response)
+                started = time.perf_counter()
+                try:
+                    return self.commands[command](*params)
+                finally:
+                    metrics.observe(f"command.{command}", time.perf_counter() - started)
             else:
                 self.logger.warning(f"Unknown command in message: {message}")
-                self.send_message(self.indonesian.get_help_message())
+                return self.indonesian.get_help_message()
                 
         except Exception as e:
             self.logger.error(f"Error processing message '{message}': {str(e)}")
-            self.send_message(self.indonesian.get_error_message())
+            return self.indonesian.get_error_message()
 
     def send_message(self, message):
-        """Send a message in the current chat"""
+        """Send a message in the current chat
+
+        Pastes the whole text in one script call and waits for the outgoing
+        bubble; if that fails, falls back to typing it with send_keys.
+        """
+        if self.sender is None:
+            self.sender = MessageSender(self.driver, timeout=Config.WHATSAPP_SEND_TIMEOUT)
+        try:
+            result = self.sender.send(message)
+        except Exception as e:
+            result = {'error': str(e), 'unconfirmed': False}
+        if not result['error']:
+            self.logger.info("Message sent successfully")
+            return
+        if result['unconfirmed']:
+            # Typing it again could deliver the message twice, so give up on this one
+            raise Exception(f"Message submitted but not confirmed: {result['error']}")
+        self.logger.warning(f"Fast send failed, typing message instead: {result['error']}")
+        metrics.increment('sender.typed_fallbacks')
+        self._type_message(message)
+
+    def _type_message(self, message):
+        """Send a message in the current chat by typing it key by key"""
         max_retries = 3
         retry_count = 0
         
@@ -494,8 +915,9 @@ class WhatsAppBot:
                     (By.CSS_SELECTOR, 'button[aria-label="Send"]')))
                 send_button.click()
                 
+                # WhatsApp empties the compose box once it has taken the message
+                wait_until(lambda: not input_box.text, timeout=5, message="compose box to clear")
                 self.logger.info("Message sent successfully")
-                time.sleep(1)
                 return  # Success, exit the retry loop
                 
             except Exception as e:
@@ -504,7 +926,8 @@ class WhatsAppBot:
                 if retry_count >= max_retries:
                     self.logger.error(f"Failed to send message after {max_retries} attempts")
                     raise
-                time.sleep(2)  # Wait before retrying
+                # Short backoff; the next attempt waits for the compose box itself
+                time.sleep(0.25 * 2 ** retry_count)
 
     def handle_expense(self, amount, category=None, *description):
         """Handle expense tracking command"""
@@ -524,17 +947,9 @@ class WhatsAppBot:
             
             self.logger.info(f"Processing expense: amount={amount}, category={category}, description={desc}")
             
-            # Create transaction record
-            transaction = {
-                "type": "expense",
-                "amount": amount,
-                "category": category,
-                "description": desc,
-                "date": datetime.now().isoformat()
-            }
-            
-            # Save transaction to database (implement database connection)
-            self.logger.info(f"Expense transaction created: {transaction}")
+            if not self.processor.add_transaction(self._user_id(), amount, category, 'expense', desc or None,
+                                                  message_key=self._message_key()):
+                return self.indonesian.get_error_message()
             
             return self.indonesian.get_success_message('expense', amount, category, desc)
             
@@ -560,17 +975,9 @@ class WhatsAppBot:
             
             self.logger.info(f"Processing income: amount={amount}, category={category}, description={desc}")
             
-            # Create transaction record
-            transaction = {
-                "type": "income",
-                "amount": amount,
-                "category": category,
-                "description": desc,
-                "date": datetime.now().isoformat()
-            }
-            
-            # Save transaction to database (implement database connection)
-            self.logger.info(f"Income transaction created: {transaction}")
+            if not self.processor.add_transaction(self._user_id(), amount, category, 'income', desc or None,
+                                                  message_key=self._message_key()):
+                return self.indonesian.get_error_message()
             
             return self.indonesian.get_success_message('income', amount, category, desc)
             
@@ -582,23 +989,41 @@ class WhatsAppBot:
         """Get current balance"""
         try:
             self.logger.info("Fetching current balance")
-            # Implement database query to get current balance
-            balance = 0  # Replace with actual balance query
+            balance = self.processor.get_balance(self._user_id())
             self.logger.info(f"Current balance: {balance}")
             return self.indonesian.get_balance_message(balance)
         except Exception as e:
             self.logger.error(f"Error fetching balance: {str(e)}")
             return self.indonesian.get_error_message()
 
-    def get_report(self):
-        """Generate financial report"""
+    def get_report(self, *args):
+        """This month's income, expenses and categories, the balance and savings goal progress"""
         try:
             self.logger.info("Generating financial report")
-            # TODO: Implement report generation logic
-            # For now, return placeholder message
-            report_message = "📊 Financial Report:\n[Report details will be implemented]"
+            user_id = self._user_id()
+            snapshot = self.processor.get_financial_snapshot(user_id)
+            goals = self.processor.get_savings_goals(user_id)
+            monthly = snapshot['monthly_summary']
+            fmt = self.indonesian.format_currency
+
+            report = [
+                f"📊 *Laporan Keuangan {datetime.now().strftime('%m/%Y')}*:\n",
+                f"💰 Saldo: {fmt(snapshot['current_balance'])}",
+                f"📥 Pemasukan: {fmt(monthly['monthly_income'])}",
+                f"📤 Pengeluaran: {fmt(monthly['monthly_expenses'])}",
+                f"💵 Sisa: {fmt(monthly['savings'])}"
+            ]
+            if monthly['expense_categories']:
+                report.append("\n*Pengeluaran per Kategori*:")
+                for category, amount in sorted(monthly['expense_categories'].items(), key=lambda item: -item[1]):
+                    report.append(f"• {category}: {fmt(amount)}")
+            if goals:
+                report.append("\n🎯 *Target Tabungan*:")
+                for goal in goals:
+                    report.append(f"• {goal['name']}: {fmt(goal['current_amount'])} / "
+                                  f"{fmt(goal['target_amount'])} ({goal['progress']:.0f}%)")
             self.logger.info("Financial report generated successfully")
-            return report_message
+            return "\n".join(report)
         except Exception as e:
             self.logger.error(f"Error generating report: {str(e)}")
             return self.indonesian.get_error_message()
@@ -618,9 +1043,7 @@ class WhatsAppBot:
         """Get personalized financial planning advice"""
         try:
             self.logger.info("Generating financial plan")
-            from src.bot.financial_processor import FinancialProcessor
-            processor = FinancialProcessor()
-            advice = processor.get_financial_advice(1)  # Using default user_id for now
+            advice = self.processor.get_financial_advice(self._user_id())
             self.logger.info("Financial plan generated successfully")
             return advice
         except Exception as e:
@@ -674,11 +1097,9 @@ class WhatsAppBot:
             goal_name = name if name else "Target Tabungan"
             goal_duration = duration if duration else "tidak ditentukan"
             
-            from src.bot.financial_processor import FinancialProcessor
-            processor = FinancialProcessor()
-            
             # Add the savings goal
-            if processor.add_savings_goal(1, goal_name, target_amount, goal_duration):
+            if self.processor.add_savings_goal(self._user_id(), goal_name, target_amount, goal_duration,
+                                               message_key=self._message_key()):
                 monthly_needed = target_amount / 6  # Assume 6 months if no duration specified
                 
                 response = [
@@ -705,9 +1126,7 @@ class WhatsAppBot:
         """Get budgeting recommendations"""
         try:
             self.logger.info("Generating budget advice")
-            from src.bot.financial_processor import FinancialProcessor
-            processor = FinancialProcessor()
-            monthly_summary = processor.get_monthly_summary(1)  # Using default user_id
+            monthly_summary = self.processor.get_monthly_summary(self._user_id())
             
             income = monthly_summary['monthly_income']
             if income == 0:
@@ -746,38 +1165,36 @@ class WhatsAppBot:
         """Get current market information"""
         try:
             self.logger.info("Fetching market information")
-            import requests
-            from src.utils.config import Config
+            from src.utils.market_data import get_market_snapshot
             
             market_info = ["📈 *Informasi Pasar Terkini*:\n"]
             
+            # Both sources are fetched concurrently; each section falls back on its own
+            market = get_market_snapshot()
+            
             # Get IHSG data
             try:
-                alpha_url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol=^JKSE&apikey={Config.ALPHA_VANTAGE_API_KEY}"
-                market_response = requests.get(alpha_url)
-                market_data = market_response.json()
-                if 'Global Quote' in market_data:
-                    quote = market_data['Global Quote']
-                    price = float(quote.get('05. price', 0))
-                    change = quote.get('10. change percent', '0%')
-                    market_info.append(f"*IHSG*:")
-                    market_info.append(f"• Harga: {price:,.2f}")
-                    market_info.append(f"• Perubahan: {change}")
+                quote = market['ihsg_quote']
+                if quote is None:
+                    raise Exception("IHSG quote unavailable")
+                price = float(quote.get('05. price', 0))
+                change = quote.get('10. change percent', '0%')
+                market_info.append(f"*IHSG*:")
+                market_info.append(f"• Harga: {price:,.2f}")
+                market_info.append(f"• Perubahan: {change}")
             except Exception as e:
                 self.logger.error(f"Error fetching IHSG data: {str(e)}")
                 market_info.append("*IHSG*: Data tidak tersedia")
             
             # Get exchange rates
             try:
-                exchange_url = f"https://v6.exchangerate-api.com/v6/{Config.EXCHANGE_RATE_API_KEY}/latest/IDR"
-                exchange_response = requests.get(exchange_url)
-                exchange_data = exchange_response.json()
-                if 'conversion_rates' in exchange_data:
-                    rates = exchange_data['conversion_rates']
-                    market_info.append("\n*Kurs Mata Uang*:")
-                    market_info.append(f"• USD/IDR: Rp {(1/rates['USD']):,.2f}")
-                    market_info.append(f"• EUR/IDR: Rp {(1/rates['EUR']):,.2f}")
-                    market_info.append(f"• SGD/IDR: Rp {(1/rates['SGD']):,.2f}")
+                rates = market['exchange_rates']
+                if rates is None:
+                    raise Exception("Exchange rates unavailable")
+                market_info.append("\n*Kurs Mata Uang*:")
+                market_info.append(f"• USD/IDR: Rp {(1/rates['USD']):,.2f}")
+                market_info.append(f"• EUR/IDR: Rp {(1/rates['EUR']):,.2f}")
+                market_info.append(f"• SGD/IDR: Rp {(1/rates['SGD']):,.2f}")
             except Exception as e:
                 self.logger.error(f"Error fetching exchange rates: {str(e)}")
                 market_info.append("\n*Kurs Mata Uang*: Data tidak tersedia")
@@ -826,10 +1243,9 @@ class WhatsAppBot:
             finally:
                 self.temp_dir = None
 
-        # Kill any remaining processes
+        # Stop any of our browser and display processes that outlived driver.quit() and display.stop()
         try:
-            subprocess.run(['pkill', '-f', '(chrome|chromedriver|Xvfb)'], 
-                         shell=True, stderr=subprocess.DEVNULL)
+            self._terminate_browser_processes(include_display=True)
         except Exception as e:
             self.logger.warning(f"Error during final process cleanup: {e}")
 
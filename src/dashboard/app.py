@@ -1,14 +1,31 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, jsonify, make_response, request, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import event
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+import base64
+import gzip
+import hashlib
+import json
 import os
+import zlib
 
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+from src.bot.financial_processor import summarize_transactions
 from src.utils.config import Config
+from src.utils.response_cache import UserResponseCache
 
 app = Flask(__name__)
 Config.init_app(app)
 db = SQLAlchemy(app)
 
+# Summary and chart payloads, dropped per user when that user's transactions change
+aggregate_cache = UserResponseCache(Config.DASHBOARD_CACHE_SIZE, Config.DASHBOARD_CACHE_TTL)
+
 # Database Models
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -24,6 +41,279 @@ class Transaction(db.Model):
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    # Back the newest-first keyset pages, with and without a user filter
+    __table_args__ = (
+        db.Index('idx_transaction_date_id', 'date', 'id'),
+        db.Index('idx_transaction_user_date_id', 'user_id', 'date', 'id'),
+    )
+
+class TransactionVersion(db.Model):
+    """Change stamp of one user's transactions, kept current by triggers on the transaction table
+
+    user_id 0 stamps every user's transactions together.
+    """
+    __tablename__ = 'transaction_version'
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    max_id = db.Column(db.Integer, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    revision = db.Column(db.Integer, nullable=False, default=0)  # bumped by every insert, update and delete
+    updated_at = db.Column(db.Float, nullable=False)  # unix time of the last change
+
+NOW_SQL = "(julianday('now') - 2440587.5) * 86400.0"
+
+# Triggers fire for every writer (the ORM, the benchmarks, a sqlite3 shell), so
+# the stamps cannot drift from the table the way application-side bookkeeping could
+VERSION_TRIGGERS = [
+    f'''CREATE TRIGGER IF NOT EXISTS transaction_version_insert AFTER INSERT ON "transaction"
+    BEGIN
+        INSERT INTO transaction_version (user_id, max_id, count, revision, updated_at)
+        VALUES (NEW.user_id, NEW.id, 1, 1, {NOW_SQL}), (0, NEW.id, 1, 1, {NOW_SQL})
+        ON CONFLICT (user_id) DO UPDATE SET max_id = MAX(max_id, excluded.max_id), count = count + 1,
+            revision = revision + 1, updated_at = excluded.updated_at;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS transaction_version_update AFTER UPDATE ON "transaction"
+    BEGIN
+        INSERT INTO transaction_version (user_id, max_id, count, revision, updated_at)
+        VALUES (NEW.user_id, NEW.id, 0, 1, {NOW_SQL}), (0, NEW.id, 0, 1, {NOW_SQL})
+        ON CONFLICT (user_id) DO UPDATE SET max_id = MAX(max_id, excluded.max_id),
+            revision = revision + 1, updated_at = excluded.updated_at;
+        UPDATE transaction_version SET count = count + 1
+        WHERE user_id = NEW.user_id AND NEW.user_id != OLD.user_id;
+        UPDATE transaction_version SET count = count - 1, revision = revision + 1, updated_at = {NOW_SQL}
+        WHERE user_id = OLD.user_id AND NEW.user_id != OLD.user_id;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS transaction_version_delete AFTER DELETE ON "transaction"
+    BEGIN
+        UPDATE transaction_version SET count = count - 1, revision = revision + 1, updated_at = {NOW_SQL}
+        WHERE user_id IN (OLD.user_id, 0);
+    END''',
+    # Stamps for transactions written before the triggers existed
+    f'''INSERT OR IGNORE INTO transaction_version (user_id, max_id, count, revision, updated_at)
+    SELECT user_id, MAX(id), COUNT(*), 0, {NOW_SQL} FROM "transaction" GROUP BY user_id
+    UNION ALL
+    SELECT 0, COALESCE(MAX(id), 0), COUNT(*), 0, {NOW_SQL} FROM "transaction"'''
+]
+
+@event.listens_for(db.Model.metadata, 'after_create')
+def install_version_triggers(target, connection, **kwargs):
+    """Add the stamp triggers whenever create_all runs, including after drop_all"""
+    for statement in VERSION_TRIGGERS:
+        connection.exec_driver_sql(statement)
+
+@event.listens_for(db.session, 'after_flush')
+def collect_changed_users(session, flush_context):
+    """Remember which users' transactions a flush wrote, to invalidate them on commit"""
+    changed = session.info.setdefault('changed_users', set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, Transaction):
+            changed.add(instance.user_id)
+            # Moving a transaction to another user changes both users' aggregates
+            history = db.inspect(instance).attrs.user_id.history
+            changed.update(user_id for user_id in history.deleted if user_id is not None)
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_changed_users(session):
+    aggregate_cache.invalidate_users(session.info.pop('changed_users', ()))
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_changed_users(session):
+    session.info.pop('changed_users', None)
+
+def init_db():
+    """Create missing tables, and indexes added to existing ones since they were created"""
+    db.create_all()
+    for index in Transaction.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+class BadRequest(ValueError):
+    """Invalid query parameter, reported to the client as a 400"""
+
+@app.errorhandler(BadRequest)
+def handle_bad_request(error):
+    return jsonify({'error': str(error)}), 400
+
+def encode_cursor(date, transaction_id):
+    """Opaque cursor pointing just past a row in (date, id) order"""
+    raw = f"{date.isoformat()}|{transaction_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        date, transaction_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(date), int(transaction_id)
+    except ValueError:
+        raise BadRequest("invalid cursor")
+
+def parse_date(name):
+    """Optional YYYY-MM-DD query parameter"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise BadRequest(f"{name} must be a date in YYYY-MM-DD format")
+
+def parse_int(name, default=None, minimum=None):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+    if minimum is not None and number < minimum:
+        raise BadRequest(f"{name} must be at least {minimum}")
+    return number
+
+def transaction_filters():
+    """SQLAlchemy conditions for the user, type, category, start and end query parameters"""
+    filters = []
+    user_id = parse_int('user_id')
+    if user_id is not None:
+        filters.append(Transaction.user_id == user_id)
+    transaction_type = request.args.get('type')
+    if transaction_type:
+        if transaction_type not in ('income', 'expense'):
+            raise BadRequest("type must be 'income' or 'expense'")
+        filters.append(Transaction.transaction_type == transaction_type)
+    category = request.args.get('category')
+    if category:
+        filters.append(Transaction.category == category)
+    start = parse_date('start')
+    if start:
+        filters.append(Transaction.date >= start)
+    end = parse_date('end')
+    if end:
+        # end is inclusive of the whole day
+        filters.append(Transaction.date < end + timedelta(days=1))
+    return filters
+
+# Transaction is a reserved word in SQLite, so the table name is quoted in raw SQL
+TRANSACTION_TABLE = '"transaction"'
+
+MONTHLY_SERIES_SQL = f'''
+    SELECT strftime('%Y-%m', date), transaction_type, SUM(amount)
+    FROM {TRANSACTION_TABLE}
+    WHERE user_id = ? AND date >= ? AND date < ?
+    GROUP BY 1, 2
+'''
+
+def add_months(year, month, count):
+    """(year, month) count months after (or before, if negative) the given one"""
+    index = year * 12 + month - 1 + count
+    return index // 12, index % 12 + 1
+
+def parse_month():
+    """month=YYYY-MM query parameter as (year, month), defaulting to the current month"""
+    value = request.args.get('month')
+    if not value:
+        now = datetime.now()
+        return now.year, now.month
+    try:
+        parsed = datetime.strptime(value, '%Y-%m')
+    except ValueError:
+        raise BadRequest("month must be in YYYY-MM format")
+    return parsed.year, parsed.month
+
+def month_start(year, month):
+    return f"{year:04d}-{month:02d}-01"
+
+def raw_connection():
+    """DB-API connection behind the request's session, for the shared aggregate SQL"""
+    return db.session.connection().connection
+
+def version_stamp(user_id):
+    """(max_id, count, revision, updated_at) of a user's transactions, or of all of them for None
+
+    Reads one row of transaction_version, never the transaction table.
+    """
+    stamp = db.session.get(TransactionVersion, user_id or 0)
+    if stamp is None:
+        return 0, 0, 0, None
+    return stamp.max_id, stamp.count, stamp.revision, stamp.updated_at
+
+def is_not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+def conditional(default_user_id=None):
+    """Answer If-None-Match / If-Modified-Since from the user's version stamp before running the view
+
+    The ETag combines the stamp with the full request path, so every page,
+    filter and format has its own tag, and with the current month, which
+    the aggregate endpoints default to.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = parse_int('user_id', default_user_id)
+            stamp = version_stamp(user_id)
+            # Shared with cached_aggregate so the stamp is read once per request
+            g.version_stamp = (user_id, stamp)
+            max_id, count, revision, updated_at = stamp
+            key = f"{max_id}:{count}:{revision}|{request.full_path}|{datetime.now():%Y-%m}"
+            etag = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+            # HTTP dates have whole-second precision
+            last_modified = datetime.fromtimestamp(int(updated_at), timezone.utc) if updated_at else None
+
+            if is_not_modified(etag, last_modified):
+                response = app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+            # Weak, so the tag still matches once the body is compressed
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            # Cached by the browser but revalidated on every use
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+def cached_aggregate(view):
+    """Serve the dict a view returns from aggregate_cache, per user and full request path
+
+    Goes below conditional(), whose version stamp is stored with each entry:
+    writes in this process drop the user's entries right away, and a
+    stamp that moved (a write from another process) makes them stale.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id, stamp = g.version_stamp
+        key = (request.full_path, datetime.now().strftime('%Y-%m'))
+        found, payload = aggregate_cache.get(user_id, key, stamp)
+        if not found:
+            payload = view(*args, **kwargs)
+            aggregate_cache.put(user_id, key, payload, stamp)
+        return jsonify(payload)
+    return wrapper
+
+@app.after_request
+def compress_response(response):
+    """Gzip or brotli compress JSON bodies of at least COMPRESS_MIN_SIZE bytes"""
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < Config.COMPRESS_MIN_SIZE:
+        return response
+    encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+    if encoding == 'br':
+        response.set_data(brotli.compress(data, quality=5))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(data, compresslevel=6))
+    else:
+        return response
+    response.headers['Content-Encoding'] = encoding
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -33,17 +323,193 @@ def dashboard():
     return render_template('dashboard.html')
 
 @app.route('/api/transactions')
+@conditional()
 def get_transactions():
-    transactions = Transaction.query.all()
-    return jsonify([{
-        'id': t.id,
-        'amount': t.amount,
-        'category': t.category,
-        'type': t.transaction_type,
-        'date': t.date.strftime('%Y-%m-%d')
-    } for t in transactions])
+    """Newest-first page of transactions
+
+    Query parameters: user_id, type, category, start and end (YYYY-MM-DD,
+    inclusive), limit (capped at API_MAX_PAGE_SIZE) and cursor, taken from
+    next_cursor of the previous page. Pages are keyed on (date, id) rather
+    than an offset, so every page costs the same however deep it is and
+    rows inserted meanwhile do not shift the pages that follow.
+    """
+    limit = min(parse_int('limit', Config.API_PAGE_SIZE, minimum=1), Config.API_MAX_PAGE_SIZE)
+    query = db.session.query(
+        Transaction.id, Transaction.amount, Transaction.category,
+        Transaction.transaction_type, Transaction.date
+    ).filter(*transaction_filters())
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        date, transaction_id = decode_cursor(cursor)
+        query = query.filter(db.tuple_(Transaction.date, Transaction.id) < (date, transaction_id))
+
+    # One extra row tells whether another page follows
+    rows = query.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify({
+        'transactions': [{
+            'id': t.id,
+            'amount': t.amount,
+            'category': t.category,
+            'type': t.transaction_type,
+            'date': t.date.strftime('%Y-%m-%d')
+        } for t in rows],
+        'next_cursor': encode_cursor(rows[-1].date, rows[-1].id) if has_more else None
+    })
+
+# Rows fetched from the database and written to the response at a time
+EXPORT_BATCH_SIZE = 1000
+
+def export_rows(query):
+    """Yield export records from query in batches, without loading the result"""
+    for t in query.yield_per(EXPORT_BATCH_SIZE):
+        yield {
+            'id': t.id,
+            'user_id': t.user_id,
+            'amount': t.amount,
+            'category': t.category,
+            'type': t.transaction_type,
+            'description': t.description,
+            'date': t.date.isoformat()
+        }
+
+def encode_export(rows, fmt):
+    """Serialize records as NDJSON lines or one JSON array, one text chunk per batch"""
+    chunk = []
+    first = True
+    if fmt == 'json':
+        yield '['
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False)
+        if fmt == 'json':
+            chunk.append(line if first else ',' + line)
+            first = False
+        else:
+            chunk.append(line + '\n')
+        if len(chunk) >= EXPORT_BATCH_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+    if fmt == 'json':
+        yield ']'
+
+def gzip_chunks(chunks):
+    """Gzip a stream of text chunks incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/api/transactions/export')
+@conditional()
+def export_transactions():
+    """Every matching transaction, streamed as NDJSON (default) or a JSON array
+
+    Takes the same filters as /api/transactions and format=ndjson|json.
+    Rows are read in batches and written as they are serialized, so memory
+    use does not grow with the size of the export. The body is gzipped when
+    the client accepts it.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'json'):
+        raise BadRequest("format must be 'ndjson' or 'json'")
+    query = db.session.query(
+        Transaction.id, Transaction.user_id, Transaction.amount, Transaction.category,
+        Transaction.transaction_type, Transaction.description, Transaction.date
+    ).filter(*transaction_filters()).order_by(Transaction.date, Transaction.id)
+
+    body = encode_export(export_rows(query), fmt)
+    headers = {
+        'Content-Disposition': f'attachment; filename=transactions.{fmt}',
+        'Vary': 'Accept-Encoding'
+    }
+    if 'gzip' in request.accept_encodings:
+        body = gzip_chunks(body)
+        headers['Content-Encoding'] = 'gzip'
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+@app.route('/api/summary')
+@conditional(Config.DASHBOARD_USER_ID)
+@cached_aggregate
+def get_summary():
+    """Current balance and the income, expenses and savings of one month"""
+    user_id = parse_int('user_id', Config.DASHBOARD_USER_ID)
+    year, month = parse_month()
+    start = month_start(year, month)
+    end = month_start(*add_months(year, month, 1))
+    summary = summarize_transactions(raw_connection(), user_id, start, end, table=TRANSACTION_TABLE)
+    monthly = summary['monthly_summary']
+    return {
+        'user_id': user_id,
+        'month': f"{year:04d}-{month:02d}",
+        'current_balance': summary['current_balance'],
+        'monthly_income': monthly['monthly_income'],
+        'monthly_expenses': monthly['monthly_expenses'],
+        'savings': monthly['savings']
+    }
+
+@app.route('/api/monthly-series')
+@conditional(Config.DASHBOARD_USER_ID)
+@cached_aggregate
+def get_monthly_series():
+    """Income and expense totals per month for the months up to and including month"""
+    user_id = parse_int('user_id', Config.DASHBOARD_USER_ID)
+    months = min(parse_int('months', 6, minimum=1), Config.API_MAX_SERIES_MONTHS)
+    year, month = parse_month()
+    first = add_months(year, month, -(months - 1))
+    labels = [f"{y:04d}-{m:02d}" for y, m in (add_months(*first, i) for i in range(months))]
+
+    totals = {'income': dict.fromkeys(labels, 0), 'expense': dict.fromkeys(labels, 0)}
+    rows = raw_connection().execute(
+        MONTHLY_SERIES_SQL, (user_id, month_start(*first), month_start(*add_months(year, month, 1)))
+    ).fetchall()
+    for label, transaction_type, total in rows:
+        if transaction_type in totals:
+            totals[transaction_type][label] = total
+    return {
+        'user_id': user_id,
+        'labels': labels,
+        'income': list(totals['income'].values()),
+        'expense': list(totals['expense'].values())
+    }
+
+@app.route('/api/category-breakdown')
+@conditional(Config.DASHBOARD_USER_ID)
+@cached_aggregate
+def get_category_breakdown():
+    """Per-category totals of one month's expenses (or income with type=income), largest first"""
+    user_id = parse_int('user_id', Config.DASHBOARD_USER_ID)
+    transaction_type = request.args.get('type', 'expense')
+    if transaction_type not in ('income', 'expense'):
+        raise BadRequest("type must be 'income' or 'expense'")
+    year, month = parse_month()
+    start = month_start(year, month)
+    end = month_start(*add_months(year, month, 1))
+    monthly = summarize_transactions(raw_connection(), user_id, start, end, table=TRANSACTION_TABLE,
+                                     include_balance=False)['monthly_summary']
+    categories = monthly['expense_categories' if transaction_type == 'expense' else 'income_categories']
+    total = sum(categories.values())
+    return {
+        'user_id': user_id,
+        'month': f"{year:04d}-{month:02d}",
+        'type': transaction_type,
+        'total': total,
+        'categories': [{'category': category, 'total': amount, 'share': amount / total if total else 0}
+                       for category, amount in sorted(categories.items(), key=lambda item: -item[1])]
+    }
+
+@app.route('/api/cache-stats')
+def get_cache_stats():
+    """Hit and miss counters of the aggregate cache"""
+    return jsonify(aggregate_cache.stats())
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        init_db()
     app.run(debug=True, port=8000)
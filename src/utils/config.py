@@ -17,18 +17,62 @@ class Config:
     
     # WhatsApp Bot Configuration
     WHATSAPP_ENABLED = os.getenv('WHATSAPP_ENABLED', 'false').lower() == 'true'  # Disabled by default
+    WHATSAPP_PROFILE_DIR = os.getenv('WHATSAPP_PROFILE_DIR', os.path.join(os.getcwd(), 'instance', 'chrome_profile'))  # empty for a throwaway profile per start
+    WHATSAPP_USE_DISPLAY = os.getenv('WHATSAPP_USE_DISPLAY', 'false').lower() == 'true'  # headed Chrome on Xvfb instead of headless
+    WHATSAPP_POLL_TIMEOUT = float(os.getenv('WHATSAPP_POLL_TIMEOUT', 5))  # max seconds one listener poll waits for events
+    WHATSAPP_OPEN_CHAT_TIMEOUT = float(os.getenv('WHATSAPP_OPEN_CHAT_TIMEOUT', 10))  # max seconds to wait for an opened chat's messages
+    WHATSAPP_SEND_TIMEOUT = float(os.getenv('WHATSAPP_SEND_TIMEOUT', 10))  # max seconds for one message to show as sent
+    WHATSAPP_WORKERS = int(os.getenv('WHATSAPP_WORKERS', 4))  # threads running command handlers
+    WHATSAPP_JOB_QUEUE_SIZE = int(os.getenv('WHATSAPP_JOB_QUEUE_SIZE', 100))  # queued messages before scraping pauses
+    WHATSAPP_LEDGER_PATH = os.getenv('WHATSAPP_LEDGER_PATH', os.path.join(os.getcwd(), 'instance', 'message_ledger.db'))  # processed-message ledger
+    WHATSAPP_LEDGER_CACHE_SIZE = int(os.getenv('WHATSAPP_LEDGER_CACHE_SIZE', 10000))  # ledger entries kept in memory
+    WHATSAPP_LEDGER_RETENTION_DAYS = int(os.getenv('WHATSAPP_LEDGER_RETENTION_DAYS', 30))  # days replied entries are kept
+    WHATSAPP_METRICS_INTERVAL = int(os.getenv('WHATSAPP_METRICS_INTERVAL', 300))  # seconds between pipeline metric log lines
+    WHATSAPP_SHARDS = int(os.getenv('WHATSAPP_SHARDS', 1))  # bot processes, one WhatsApp account each
+    WHATSAPP_DEBUG_PORT_BASE = int(os.getenv('WHATSAPP_DEBUG_PORT_BASE', 9222))  # shard N uses this port + N
+    WHATSAPP_SHARD_CHECK_INTERVAL = 5  # seconds between shard health checks
+    WHATSAPP_SHARD_STARTUP_TIMEOUT = int(os.getenv('WHATSAPP_SHARD_STARTUP_TIMEOUT', 600))  # seconds a shard may take to log in
+    WHATSAPP_SHARD_HEARTBEAT_TIMEOUT = int(os.getenv('WHATSAPP_SHARD_HEARTBEAT_TIMEOUT', 180))  # silent seconds before a shard is restarted
+    WHATSAPP_SHARD_STABLE_AFTER = 600  # seconds of uptime after which a shard's restart backoff resets
+    WHATSAPP_PROCESS_STOP_TIMEOUT = float(os.getenv('WHATSAPP_PROCESS_STOP_TIMEOUT', 5))  # seconds after SIGTERM before browser processes are killed
     
     # Financial Settings
+    FINANCIAL_DB_PATH = os.getenv('FINANCIAL_DB_PATH', 'financial.db')  # database the WhatsApp bot records transactions in
+    WHATSAPP_DEFAULT_USER_ID = int(os.getenv('WHATSAPP_DEFAULT_USER_ID', 1))  # user for commands whose chat is unknown
     DEFAULT_CURRENCY = 'Rp'  # Indonesian Rupiah
     SAVINGS_ALLOCATION_PERCENTAGE = 20  # Default percentage of income to allocate to savings
     
     # API Configuration
     API_VERSION = 'v1'
     API_PREFIX = f'/api/{API_VERSION}'
+    API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 50))  # rows per page when the client does not ask
+    API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 500))  # cap on the limit a client may request
+    DASHBOARD_USER_ID = int(os.getenv('DASHBOARD_USER_ID', 1))  # user the summary endpoints report on by default
+    API_MAX_SERIES_MONTHS = 36  # longest monthly series a client may request
+    DASHBOARD_CACHE_SIZE = int(os.getenv('DASHBOARD_CACHE_SIZE', 1024))  # cached aggregate responses across all users
+    DASHBOARD_CACHE_TTL = float(os.getenv('DASHBOARD_CACHE_TTL', 60))  # seconds a cached aggregate is served
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # bytes before JSON responses are compressed
     
     # Financial APIs
     ALPHA_VANTAGE_API_KEY = os.getenv('ALPHA_VANTAGE_API_KEY', '')
     EXCHANGE_RATE_API_KEY = os.getenv('EXCHANGE_RATE_API_KEY', '')
+    ALPHA_VANTAGE_API_URL = os.getenv('ALPHA_VANTAGE_API_URL', 'https://www.alphavantage.co/query')
+    EXCHANGE_RATE_API_URL = os.getenv('EXCHANGE_RATE_API_URL', 'https://v6.exchangerate-api.com/v6')
+    
+    # Outbound HTTP
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3))  # seconds to establish a connection
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))  # seconds to wait for a response
+    HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 2))  # retries on connection errors and 429/5xx
+    HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', 0.3))  # exponential backoff between retries
+    
+    # Market Data Cache
+    EXCHANGE_RATE_TTL = int(os.getenv('EXCHANGE_RATE_TTL', 3600))  # seconds before rates are refreshed
+    MARKET_QUOTE_TTL = int(os.getenv('MARKET_QUOTE_TTL', 300))  # seconds before IHSG quote is refreshed
+    EXCHANGE_RATE_DEADLINE = float(os.getenv('EXCHANGE_RATE_DEADLINE', 3))  # max wait on a cold rates fetch
+    MARKET_QUOTE_DEADLINE = float(os.getenv('MARKET_QUOTE_DEADLINE', 3))  # max wait on a cold IHSG fetch
+    MARKET_DATA_MAX_STALE = int(os.getenv('MARKET_DATA_MAX_STALE', 86400))  # serve stale data this long while refreshing
+    MARKET_DATA_FAILURE_THRESHOLD = 3  # consecutive failures before the circuit opens
+    MARKET_DATA_RESET_TIMEOUT = 60  # seconds before an open circuit allows a retry
     
     # AI Model Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')  # For financial advice generation
@@ -0,0 +1,119 @@
+"""Shared outbound HTTP client.
+
+One requests.Session for the whole process, with a keep-alive connection
+pool and retry/backoff adapter mounted per host on first use, default
+timeouts, and per-host latency and retry metrics.
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.utils.config import Config
+
+
+def _percentile(sorted_samples, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+
+class HttpClient:
+    """Pooled, retrying HTTP client that records latency per host"""
+
+    # Recent samples kept per host for percentile metrics
+    LATENCY_SAMPLES = 500
+
+    def __init__(self, timeout: Optional[tuple] = None, retries: int = 2, backoff_factor: float = 0.3,
+                 pool_maxsize: int = 10):
+        self.timeout = timeout or (Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool_maxsize = pool_maxsize
+        self.session = requests.Session()
+        self._mounted = set()
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _mount(self, url: str) -> str:
+        """Give each scheme://host its own pool and retry policy; return the host key"""
+        parts = urlsplit(url)
+        prefix = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            if prefix not in self._mounted:
+                retry = Retry(
+                    total=self.retries,
+                    backoff_factor=self.backoff_factor,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(['GET', 'HEAD']),
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+                self.session.mount(prefix + '/', adapter)
+                self._mounted.add(prefix)
+            if parts.netloc not in self._metrics:
+                self._metrics[parts.netloc] = {
+                    'requests': 0,
+                    'errors': 0,
+                    'retries': 0,
+                    'total_seconds': 0.0,
+                    'max_seconds': 0.0,
+                    'samples': deque(maxlen=self.LATENCY_SAMPLES)
+                }
+        return parts.netloc
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request through the shared session, timing it against its host"""
+        host = self._mount(url)
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.perf_counter()
+        failed = True
+        retries = 0
+        try:
+            response = self.session.request(method, url, **kwargs)
+            failed = response.status_code >= 500
+            # urllib3 records every retry it made in the final Retry's history
+            retry_state = getattr(response.raw, 'retries', None)
+            retries = len(retry_state.history) if retry_state is not None else 0
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                stats = self._metrics[host]
+                stats['requests'] += 1
+                stats['errors'] += int(failed)
+                stats['retries'] += retries
+                stats['total_seconds'] += elapsed
+                stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+                stats['samples'].append(elapsed)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Per-host request, error and retry counts and latency in milliseconds"""
+        with self._lock:
+            snapshot = {host: dict(stats, samples=sorted(stats['samples']))
+                        for host, stats in self._metrics.items()}
+        result = {}
+        for host, stats in snapshot.items():
+            samples = stats['samples']
+            result[host] = {
+                'requests': stats['requests'],
+                'errors': stats['errors'],
+                'retries': stats['retries'],
+                'avg_ms': stats['total_seconds'] / stats['requests'] * 1000 if stats['requests'] else 0,
+                'p50_ms': _percentile(samples, 0.50) * 1000,
+                'p95_ms': _percentile(samples, 0.95) * 1000,
+                'max_ms': stats['max_seconds'] * 1000
+            }
+        return result
+
+
+http_client = HttpClient(retries=Config.HTTP_RETRIES, backoff_factor=Config.HTTP_BACKOFF_FACTOR)
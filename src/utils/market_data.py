@@ -0,0 +1,204 @@
+"""Shared in-memory cache for upstream market data (IHSG quote, IDR exchange rates).
+
+Values are served from memory while fresh. Once a value passes its TTL the
+stale copy is still returned immediately and a background refresh is
+scheduled. Only a cold or fully expired entry blocks on the network, and
+then only up to that source's deadline; several cold sources are fetched
+concurrently. A per-source circuit breaker stops hammering an upstream
+that keeps failing.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from src.utils.config import Config
+from src.utils.http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Open after consecutive failures, then allow a single trial call after a cool-down"""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a call may go upstream right now"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: let one trial call through and re-arm the timer
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+
+class MarketDataCache:
+    """Per-source TTL cache with stale-while-revalidate refreshes"""
+
+    def __init__(self, max_workers: int = 4):
+        self._sources = {}
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='market-data')
+
+    def register(self, name: str, fetch: Callable[[], Any], ttl: float, max_stale: float,
+                 deadline: float = 5, breaker: Optional[CircuitBreaker] = None):
+        """Register an upstream fetch function under a cache key
+
+        deadline bounds how long a reader waits on a cold fetch; the fetch
+        itself keeps running and fills the cache for later readers.
+        """
+        self._sources[name] = {
+            'fetch': fetch,
+            'ttl': ttl,
+            'max_stale': max_stale,
+            'deadline': deadline,
+            'breaker': breaker or CircuitBreaker()
+        }
+
+    def get(self, name: str) -> Optional[Any]:
+        """Return the cached value, refreshing in the background or inline as needed"""
+        return self.get_many([name])[name]
+
+    def get_many(self, names: Iterable[str]) -> Dict[str, Optional[Any]]:
+        """Read several sources at once, fetching the cold ones concurrently
+
+        Each cold source is waited on up to its own deadline, so one slow
+        upstream cannot hold back the others; a source that misses its
+        deadline comes back as None.
+        """
+        results = {}
+        pending = {}
+        for name in names:
+            usable, value = self._cached(name)
+            if usable:
+                results[name] = value
+            else:
+                pending[name] = self._submit(name)
+
+        started = time.monotonic()
+        for name, future in pending.items():
+            remaining = self._sources[name]['deadline'] - (time.monotonic() - started)
+            try:
+                results[name] = future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                logger.warning(f"Fetching {name} missed its {self._sources[name]['deadline']}s deadline")
+                results[name] = None
+        return results
+
+    def _cached(self, name: str) -> tuple:
+        """Return (usable, value) for a source, scheduling a refresh if it is stale"""
+        source = self._sources[name]
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None:
+            return False, None
+        value, fetched_at = entry
+        age = time.monotonic() - fetched_at
+        if age < source['ttl']:
+            return True, value
+        if age < source['ttl'] + source['max_stale']:
+            self.refresh_async(name)
+            return True, value
+        return False, None
+
+    def _submit(self, name: str):
+        """Start a refresh unless one is already in flight, returning its future"""
+        with self._lock:
+            future = self._inflight.get(name)
+            if future is None or future.done():
+                future = self._executor.submit(self._refresh, name)
+                self._inflight[name] = future
+            return future
+
+    def refresh_async(self, name: str):
+        """Schedule a background refresh unless one is already running for this source"""
+        try:
+            self._submit(name)
+        except RuntimeError:
+            # Executor already shut down at interpreter exit
+            pass
+
+    def warm_up(self):
+        """Start background fetches for every registered source"""
+        for name in self._sources:
+            self.refresh_async(name)
+
+    def _refresh(self, name: str) -> Optional[Any]:
+        """Fetch a source now, returning None when it fails or its breaker is open"""
+        source = self._sources[name]
+        breaker = source['breaker']
+        if not breaker.allow():
+            logger.debug(f"Circuit open for {name}, skipping upstream call")
+            return None
+        try:
+            value = source['fetch']()
+        except Exception as e:
+            breaker.record_failure()
+            logger.warning(f"Error fetching {name}: {str(e)}")
+            return None
+        breaker.record_success()
+        with self._lock:
+            self._entries[name] = (value, time.monotonic())
+        return value
+
+
+def _fetch_exchange_rates() -> Dict[str, float]:
+    """Fetch IDR conversion rates from exchangerate-api"""
+    url = f"{Config.EXCHANGE_RATE_API_URL}/{Config.EXCHANGE_RATE_API_KEY}/latest/IDR"
+    response = http_client.get(url)
+    response.raise_for_status()
+    return response.json()['conversion_rates']
+
+
+def _fetch_ihsg_quote() -> Dict[str, str]:
+    """Fetch the IHSG (^JKSE) global quote from Alpha Vantage"""
+    params = {'function': 'GLOBAL_QUOTE', 'symbol': '^JKSE', 'apikey': Config.ALPHA_VANTAGE_API_KEY}
+    response = http_client.get(Config.ALPHA_VANTAGE_API_URL, params=params)
+    response.raise_for_status()
+    data = response.json()
+    if 'Global Quote' not in data:
+        # Rate-limit notes and bad keys come back as 200 without a quote
+        raise ValueError(data.get('Note') or data.get('Error Message') or "missing 'Global Quote'")
+    return data['Global Quote']
+
+
+market_data = MarketDataCache()
+market_data.register('exchange_rates', _fetch_exchange_rates,
+                     ttl=Config.EXCHANGE_RATE_TTL, max_stale=Config.MARKET_DATA_MAX_STALE,
+                     deadline=Config.EXCHANGE_RATE_DEADLINE,
+                     breaker=CircuitBreaker(Config.MARKET_DATA_FAILURE_THRESHOLD, Config.MARKET_DATA_RESET_TIMEOUT))
+market_data.register('ihsg_quote', _fetch_ihsg_quote,
+                     ttl=Config.MARKET_QUOTE_TTL, max_stale=Config.MARKET_DATA_MAX_STALE,
+                     deadline=Config.MARKET_QUOTE_DEADLINE,
+                     breaker=CircuitBreaker(Config.MARKET_DATA_FAILURE_THRESHOLD, Config.MARKET_DATA_RESET_TIMEOUT))
+
+
+def get_market_snapshot() -> Dict[str, Optional[Dict]]:
+    """Exchange rates and IHSG quote fetched concurrently; missing parts are None"""
+    return market_data.get_many(['exchange_rates', 'ihsg_quote'])
@@ -0,0 +1,108 @@
+"""In-process counters, gauges and latency histograms.
+
+Histograms use fixed millisecond buckets so recording is O(1) and memory
+stays constant however long the process runs; percentiles are reported
+as the upper bound of the bucket they fall in, capped at the largest
+sample seen.
+"""
+import bisect
+import threading
+from typing import Dict, Optional
+
+# Bucket upper bounds in milliseconds; anything slower lands in the overflow bucket
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets_ms: tuple = DEFAULT_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        ms = seconds * 1000
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of samples"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = fraction * self.count
+            seen = 0
+            for index, bucket_count in enumerate(self.counts):
+                seen += bucket_count
+                if seen >= rank and bucket_count:
+                    return min(self.buckets_ms[index], self.max_ms) if index < len(self.buckets_ms) else self.max_ms
+            return self.max_ms
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            count, total_ms, max_ms = self.count, self.total_ms, self.max_ms
+        return {
+            'count': count,
+            'avg_ms': total_ms / count if count else 0.0,
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': max_ms
+        }
+
+
+class Metrics:
+    """Named counters, gauges and histograms shared across threads"""
+
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def gauge(self, name: str, value: float):
+        """Set a gauge, also tracking the highest value it has reached"""
+        with self._lock:
+            self._gauges[name] = value
+            peak = name + '.max'
+            self._gauges[peak] = max(self._gauges.get(peak, value), value)
+
+    def histogram(self, name: str) -> Histogram:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            return histogram
+
+    def observe(self, name: str, seconds: float):
+        self.histogram(name).record(seconds)
+
+    def snapshot(self, prefix: Optional[str] = None) -> Dict[str, Dict]:
+        """Current values, optionally limited to names starting with prefix"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = dict(self._histograms)
+
+        def matches(name):
+            return prefix is None or name.startswith(prefix)
+
+        return {
+            'counters': {name: value for name, value in counters.items() if matches(name)},
+            'gauges': {name: value for name, value in gauges.items() if matches(name)},
+            'histograms': {name: h.snapshot() for name, h in histograms.items() if matches(name)}
+        }
+
+
+metrics = Metrics()
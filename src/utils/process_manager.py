@@ -0,0 +1,259 @@
+"""Track and stop the exact processes a bot started.
+
+Processes are registered by PID with a role (xvfb, chromedriver, chrome)
+instead of being found with pkill patterns, so several bots, or any other
+Chrome, can run on the same machine. Stopping sends SIGTERM, waits, and
+SIGKILLs whatever is left, then reaps our own children so no zombies pile
+up. Resource usage is read from /proc; the bot already needs Linux for
+Xvfb.
+"""
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def _stat_fields(pid: int) -> Optional[List[str]]:
+    """Fields of /proc/<pid>/stat after the command name, or None if the process is gone"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # The command name may contain spaces; fields resume after its closing paren
+            return f.read().rsplit(')', 1)[1].split()
+    except (OSError, IndexError):
+        return None
+
+
+def is_running(pid: int) -> bool:
+    """True if pid exists and is not a zombie"""
+    fields = _stat_fields(pid)
+    if fields is not None:
+        return fields[0] != 'Z'
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # No /proc (not Linux): the signal check is all we have
+    return True
+
+
+def start_time(pid: int) -> Optional[int]:
+    """When a process started, in clock ticks since boot (/proc/<pid>/stat field 22)
+
+    A PID and its start time together identify one process, even after the
+    kernel hands the PID to a new one.
+    """
+    fields = _stat_fields(pid)
+    return int(fields[19]) if fields else None
+
+
+def command_name(pid: int) -> Optional[str]:
+    """Executable name of a process (/proc/<pid>/comm), or None if it is gone"""
+    try:
+        with open(f'/proc/{pid}/comm') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def descendant_pids(root_pid: int) -> List[int]:
+    """PIDs of every descendant of root_pid"""
+    children = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        fields = _stat_fields(int(entry))
+        if fields:
+            children.setdefault(int(fields[1]), []).append(int(entry))
+    found, stack = [], [root_pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def process_usage(pid: int) -> Optional[Dict[str, float]]:
+    """Resident memory in MB and total CPU seconds used by one process"""
+    fields = _stat_fields(pid)
+    if fields is None:
+        return None
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+    rss_mb = 0.0
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss_mb = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        return None
+    return {'rss_mb': rss_mb, 'cpu_seconds': cpu_seconds}
+
+
+class ProcessManager:
+    """PIDs started on behalf of one bot, grouped by role"""
+
+    def __init__(self, name: str = 'bot'):
+        self.name = name
+        self._pids: Dict[int, str] = {}
+        self._roots: Dict[int, str] = {}
+        self._start_times: Dict[int, Optional[int]] = {}
+        self._children = set()  # PIDs found by refresh() rather than passed to track()
+        self._cpu_samples: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def track(self, pid: int, role: str, include_children: bool = False):
+        """Register a process; with include_children its descendants are tracked too, now and later"""
+        with self._lock:
+            self._pids[pid] = role
+            self._start_times[pid] = start_time(pid)
+            self._children.discard(pid)
+            if include_children:
+                self._roots[pid] = role
+        if include_children:
+            self.refresh()
+        logger.debug(f"{self.name}: tracking {role} PID {pid}")
+
+    def is_tracked_process(self, pid: int) -> bool:
+        """True if pid is tracked, running, and still the process that was tracked under it"""
+        with self._lock:
+            if pid not in self._start_times:
+                return False
+            recorded = self._start_times[pid]
+        return is_running(pid) and (recorded is None or start_time(pid) == recorded)
+
+    def refresh(self):
+        """Pick up children the tracked roots started since the last call (e.g. new renderers)
+
+        Processes that exited, or whose PID now belongs to another process,
+        are dropped. So are children that left a root's tree while the root
+        is still alive; the children of a root that died are kept, since
+        those orphans are exactly what terminate() has to clean up.
+        """
+        # Collect our own exited children first so they are not left as zombies once forgotten
+        self.reap()
+        with self._lock:
+            roots = dict(self._roots)
+        descendants = set()
+        live_roots = [root for root in roots if self.is_tracked_process(root)]
+        for root in live_roots:
+            child_role = 'chrome' if roots[root] == 'chromedriver' else roots[root]
+            for pid in descendant_pids(root):
+                descendants.add(pid)
+                with self._lock:
+                    if pid not in self._pids:
+                        self._pids[pid] = child_role
+                        self._start_times[pid] = start_time(pid)
+                        self._children.add(pid)
+
+        stale = [pid for pid in self.pids() if not self.is_tracked_process(pid)]
+        if live_roots and len(live_roots) == len(roots):
+            with self._lock:
+                stale.extend(self._children - descendants)
+        with self._lock:
+            for pid in stale:
+                self._forget(pid)
+
+    def _forget(self, pid: int):
+        """Stop tracking pid; the caller holds the lock"""
+        self._pids.pop(pid, None)
+        self._roots.pop(pid, None)
+        self._start_times.pop(pid, None)
+        self._children.discard(pid)
+
+    def pids(self, *roles: str) -> List[int]:
+        """Tracked PIDs, limited to the given roles if any are passed"""
+        with self._lock:
+            return [pid for pid, role in self._pids.items() if not roles or role in roles]
+
+    def terminate(self, pids: Optional[Iterable[int]] = None, timeout: float = 5) -> Dict[str, int]:
+        """SIGTERM the given (default: all) tracked processes, SIGKILL any still alive after timeout
+
+        PIDs that are not tracked, or now belong to a different process, are
+        left alone. Returns how many exited on SIGTERM and how many had to be
+        killed.
+        """
+        self.refresh()
+        # Never signal a PID the kernel has since given to an unrelated process
+        targets = [pid for pid in (self.pids() if pids is None else list(pids)) if self.is_tracked_process(pid)]
+        for pid in targets:
+            self._signal(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + timeout
+        remaining = targets
+        interval = 0.02
+        while remaining and time.monotonic() < deadline:
+            time.sleep(interval)
+            interval = min(interval * 2, 0.25)
+            self.reap()
+            remaining = [pid for pid in remaining if self.is_tracked_process(pid)]
+
+        for pid in remaining:
+            logger.warning(f"{self.name}: PID {pid} ({self._pids.get(pid, 'untracked')}) ignored SIGTERM, killing")
+            self._signal(pid, signal.SIGKILL)
+        if remaining:
+            time.sleep(0.05)
+        self.reap()
+
+        with self._lock:
+            for pid in targets if pids is not None else list(self._pids):
+                if not is_running(pid):
+                    self._forget(pid)
+        return {'terminated': len(targets) - len(remaining), 'killed': len(remaining)}
+
+    @staticmethod
+    def _signal(pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def reap(self) -> int:
+        """Collect exit statuses of tracked processes that are our own children"""
+        reaped = 0
+        for pid in self.pids():
+            try:
+                waited, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                # Not our child (its parent reaps it) or already collected
+                continue
+            if waited:
+                reaped += 1
+        return reaped
+
+    def usage(self) -> Dict[str, Dict[str, float]]:
+        """RSS, CPU seconds, CPU percent since the previous call and process count per role"""
+        self.reap()
+        self.refresh()
+        totals: Dict[str, Dict[str, float]] = {}
+        for pid in self.pids():
+            stats = process_usage(pid)
+            if stats is None:
+                continue
+            role = self._pids.get(pid, 'unknown')
+            entry = totals.setdefault(role, {'processes': 0, 'rss_mb': 0.0, 'cpu_seconds': 0.0})
+            entry['processes'] += 1
+            entry['rss_mb'] += stats['rss_mb']
+            entry['cpu_seconds'] += stats['cpu_seconds']
+
+        now = time.monotonic()
+        for role, entry in totals.items():
+            previous = self._cpu_samples.get(role)
+            if previous and now > previous[0]:
+                entry['cpu_percent'] = max(entry['cpu_seconds'] - previous[1], 0) / (now - previous[0]) * 100
+            else:
+                entry['cpu_percent'] = 0.0
+            self._cpu_samples[role] = (now, entry['cpu_seconds'])
+        return totals
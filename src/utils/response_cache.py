@@ -0,0 +1,104 @@
+"""Per-user LRU + TTL cache for computed API responses.
+
+Entries are grouped by user so a write can drop exactly the entries of the
+user it touched. Each entry can also carry a version (the dashboard's
+transaction stamp); a lookup with a different version is a miss, which
+catches writes made by other processes that cannot call invalidate_user().
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class UserResponseCache:
+    """LRU of (user_id, key) -> value with a TTL and per-user invalidation"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (user_id, key) -> (expires_at, version, value), most recently used last
+        self._keys_by_user: Dict[Any, set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id, key: Hashable, version: Any = None) -> Tuple[bool, Any]:
+        """Return (True, value) for a fresh entry of the same version, else (False, None)"""
+        entry_key = (user_id, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, entry_version, value = entry
+            if expires_at <= time.monotonic() or entry_version != version:
+                if expires_at <= time.monotonic():
+                    self.expired += 1
+                else:
+                    self.stale += 1
+                self.misses += 1
+                self._remove(entry_key)
+                return False, None
+            self.hits += 1
+            self._entries.move_to_end(entry_key)
+            return True, value
+
+    def put(self, user_id, key: Hashable, value: Any, version: Any = None):
+        entry_key = (user_id, key)
+        with self._lock:
+            self._entries[entry_key] = (time.monotonic() + self.ttl, version, value)
+            self._entries.move_to_end(entry_key)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, entry_key: tuple):
+        self._entries.pop(entry_key, None)
+        user_id, key = entry_key
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def invalidate_user(self, user_id):
+        """Drop every entry of one user"""
+        with self._lock:
+            keys = self._keys_by_user.pop(user_id, ())
+            for key in keys:
+                self._entries.pop((user_id, key), None)
+            self.invalidations += len(keys)
+
+    def invalidate_users(self, user_ids: Iterable):
+        for user_id in set(user_ids):
+            self.invalidate_user(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Counters for tuning size and TTL"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'users': len(self._keys_by_user),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'expired': self.expired,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,64 @@
+"""Readiness waits and wall-clock phase timing.
+
+wait_until replaces fixed sleeps: it polls a condition starting with a
+short interval and backs off, so it returns as soon as the condition
+holds instead of always paying the worst case.
+"""
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from src.utils.metrics import metrics
+
+
+def wait_until(condition: Callable[[], Any], timeout: float, interval: float = 0.05,
+               max_interval: float = 0.5, message: str = "condition") -> Any:
+    """Poll condition until it returns a truthy value and return that value
+
+    The interval doubles after every miss up to max_interval. Exceptions
+    from condition count as a miss. Raises TimeoutError after timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            result = condition()
+            if result:
+                return result
+        except Exception:
+            pass
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Timed out after {timeout}s waiting for {message}")
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, max_interval)
+
+
+class PhaseTimer:
+    """Record how long each named phase of an operation takes"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.phases: List[Tuple[str, float]] = []
+        self.started = time.perf_counter()
+        self._last_mark = self.started
+
+    def mark(self, name: str):
+        """Record the time since the previous mark (or since start) as a phase"""
+        now = time.perf_counter()
+        self.record(name, now - self._last_mark)
+        self._last_mark = now
+
+    def record(self, name: str, seconds: float):
+        self.phases.append((name, seconds))
+        metrics.observe(f"{self.prefix}.{name}", seconds)
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def report(self, title: Optional[str] = None) -> str:
+        """One line per phase with its share of the total wall-clock time"""
+        total = self.total()
+        lines = [f"{title or self.prefix} took {total:.2f}s:"]
+        for name, seconds in self.phases:
+            share = seconds / total * 100 if total else 0
+            lines.append(f"  {name:<24} {seconds:>8.3f}s {share:>5.1f}%")
+        return "\n".join(lines)
@@ -0,0 +1,139 @@
+"""add_transactions keeps the materialized rollups in step with raw rows.
+
+Balances and monthly summaries are read from user_balances and
+monthly_rollups, so every bulk insert must fold into them exactly as a
+full scan of transactions would, and a row that fails mid-chunk must not
+leave half of its effects behind.
+"""
+import random
+
+import pytest
+
+from src.bot.financial_processor import FinancialProcessor, summarize_transactions
+
+
+@pytest.fixture
+def processor(tmp_path):
+    processor = FinancialProcessor(str(tmp_path / 'financial.db'))
+    yield processor
+    processor.close()
+
+
+def random_rows(count, seed=7):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        rows.append({
+            'user_id': rng.randint(1, 5),
+            'amount': rng.randint(1, 500) * 1000,
+            'category': rng.choice(['makan', 'transport', 'gaji', 'bonus']),
+            'transaction_type': rng.choice(['income', 'expense']),
+            'date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 12:00:00'
+        })
+    return rows
+
+
+def test_rollups_match_a_full_scan(processor):
+    result = processor.add_transactions(random_rows(2000), chunk_size=300)
+    assert result == {'inserted': 2000, 'errors': []}
+
+    conn = processor._get_connection()
+    for user_id in range(1, 6):
+        for month in range(1, 13):
+            start = f'2024-{month:02d}-01'
+            end = '2025-01-01' if month == 12 else f'2024-{month + 1:02d}-01'
+            scanned = summarize_transactions(conn, user_id, start, end)
+            snapshot = processor.get_financial_snapshot(user_id, month, 2024)
+            assert snapshot['monthly_summary'] == scanned['monthly_summary']
+            assert snapshot['current_balance'] == scanned['current_balance']
+
+
+def test_rebuild_rollups_agrees_with_incremental_updates(processor):
+    processor.add_transactions(random_rows(1000), chunk_size=250)
+    processor.add_transaction(1, 50000, 'makan', 'expense')
+
+    assert processor.rebuild_rollups(check_only=True) == {
+        'rollups_mismatched': 0, 'balances_mismatched': 0, 'rebuilt': False}
+
+
+def test_rebuild_rollups_repairs_drift(processor):
+    processor.add_transactions(random_rows(500))
+    conn = processor._get_connection()
+    with conn:
+        conn.execute('UPDATE user_balances SET balance = balance + 1 WHERE user_id = 1')
+        conn.execute('DELETE FROM monthly_rollups WHERE user_id = 2 AND month = 3')
+
+    report = processor.rebuild_rollups(check_only=True)
+    assert report['balances_mismatched'] == 1
+    assert report['rollups_mismatched'] > 0
+
+    processor.rebuild_rollups()
+    assert processor.rebuild_rollups(check_only=True) == {
+        'rollups_mismatched': 0, 'balances_mismatched': 0, 'rebuilt': False}
+
+
+def test_invalid_rows_are_reported_by_position(processor):
+    rows = [
+        (1, 1000, 'makan', 'expense'),
+        (1, 1000, 'makan', 'refund'),
+        (1, 1000, 'makan', 'expense', None, 'yesterday'),
+        {'user_id': 1, 'amount': 1000, 'transaction_type': 'expense'},
+        (1, 2000, 'gaji', 'income'),
+    ]
+
+    result = processor.add_transactions(rows)
+
+    assert result['inserted'] == 2
+    assert [position for position, _ in result['errors']] == [1, 2, 3]
+    assert processor.get_balance(1) == 1000
+
+
+def test_failing_row_is_isolated_in_the_fallback(processor):
+    conn = processor._get_connection()
+    with conn:
+        conn.execute('''
+            CREATE TRIGGER reject_bad_rows BEFORE INSERT ON transactions
+            WHEN NEW.description = 'bad'
+            BEGIN SELECT RAISE(ABORT, 'rejected row'); END
+        ''')
+    rows = [
+        (1, 1000, 'makan', 'expense'),
+        (1, 5000, 'gaji', 'income', 'bad'),
+        (2, 3000, 'gaji', 'income'),
+    ]
+
+    result = processor.add_transactions(rows)
+
+    assert result == {'inserted': 2, 'errors': [(1, 'rejected row')]}
+    assert processor.get_balance(1) == -1000
+    assert processor.get_balance(2) == 3000
+    assert processor.rebuild_rollups(check_only=True)['rollups_mismatched'] == 0
+
+
+def test_failing_allocation_only_undoes_its_own_row(processor):
+    processor.add_savings_goal(1, 'laptop', 1000000)
+    processor.add_savings_goal(2, 'motor', 1000000)
+    conn = processor._get_connection()
+    with conn:
+        conn.execute('''
+            CREATE TRIGGER reject_allocation BEFORE UPDATE ON savings_goals
+            WHEN NEW.user_id = 2
+            BEGIN SELECT RAISE(ABORT, 'allocation failed'); END
+        ''')
+    rows = [
+        (1, 100000, 'gaji', 'income'),
+        (2, 100000, 'gaji', 'income'),
+        (2, 4000, 'makan', 'expense'),
+    ]
+
+    result = processor.add_transactions(rows)
+
+    assert result == {'inserted': 2, 'errors': [(1, 'allocation failed')]}
+    assert processor.get_balance(1) == 100000
+    # The income row and its rollups went back with the failed allocation
+    assert processor.get_balance(2) == -4000
+    rate = FinancialProcessor.SAVINGS_ALLOCATION_RATE
+    assert [goal['current_amount'] for goal in processor.get_savings_goals(1)] == [100000 * rate]
+    assert [goal['current_amount'] for goal in processor.get_savings_goals(2)] == [0]
+    assert processor.rebuild_rollups(check_only=True) == {
+        'rollups_mismatched': 0, 'balances_mismatched': 0, 'rebuilt': False}
@@ -0,0 +1,20 @@
+"""Statement date parsing in the CSV importer."""
+import pytest
+
+from src.bot.importer import parse_date
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('15/03/2024', '2024-03-15 00:00:00'),
+    ('15/03/24', '2024-03-15 00:00:00'),
+    ('2024-03-15', '2024-03-15 00:00:00'),
+    ("'15/03", '2024-03-15 00:00:00'),
+    ('29/02', '2024-02-29 00:00:00'),
+])
+def test_parse_date(text, expected):
+    assert parse_date(text, 2024) == expected
+
+
+def test_leap_day_without_year_is_rejected_in_common_years():
+    with pytest.raises(ValueError):
+        parse_date('29/02', 2023)
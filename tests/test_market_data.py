@@ -0,0 +1,158 @@
+"""MarketDataCache behaviour against a stub upstream on localhost.
+
+Each test registers its own source whose fetch goes through a real
+HttpClient to a local HTTP server, so expiry, background refreshes,
+the circuit breaker and the read deadline are exercised end to end.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.http_client import HttpClient
+from src.utils.market_data import CircuitBreaker, MarketDataCache
+
+
+class StubUpstream:
+    """Serves a numbered JSON payload, with a configurable status and delay"""
+
+    def __init__(self):
+        self.hits = 0
+        self.status = 200
+        self.delay = 0.0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.hits += 1
+                    hit, status, delay = stub.hits, stub.status, stub.delay
+                time.sleep(delay)
+                body = json.dumps({'value': hit}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream():
+    stub = StubUpstream()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def fetch(upstream):
+    client = HttpClient(timeout=(1, 5), retries=0)
+
+    def fetch():
+        response = client.get(upstream.url)
+        response.raise_for_status()
+        return response.json()['value']
+
+    return fetch
+
+
+@pytest.fixture
+def cache():
+    cache = MarketDataCache()
+    yield cache
+    cache._executor.shutdown(wait=True)
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not reached in time'
+        time.sleep(0.01)
+
+
+def test_fresh_value_is_served_from_memory(cache, fetch, upstream):
+    cache.register('quote', fetch, ttl=60, max_stale=0)
+
+    assert cache.get('quote') == 1
+    assert cache.get('quote') == 1
+    assert upstream.hits == 1
+
+
+def test_expired_value_is_fetched_again(cache, fetch, upstream):
+    cache.register('quote', fetch, ttl=0.1, max_stale=0)
+
+    assert cache.get('quote') == 1
+    time.sleep(0.15)
+    assert cache.get('quote') == 2
+    assert upstream.hits == 2
+
+
+def test_stale_value_is_returned_while_refreshing(cache, fetch, upstream):
+    cache.register('quote', fetch, ttl=0.1, max_stale=60)
+    assert cache.get('quote') == 1
+    time.sleep(0.15)
+
+    upstream.delay = 0.3
+    started = time.monotonic()
+    assert cache.get('quote') == 1
+    assert time.monotonic() - started < 0.2
+
+    wait_for(lambda: cache.get('quote') == 2)
+    assert upstream.hits == 2
+
+
+def test_circuit_opens_after_failures_and_closes_after_success(cache, fetch, upstream):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    cache.register('quote', fetch, ttl=0, max_stale=0, breaker=breaker)
+    upstream.status = 500
+
+    assert cache.get('quote') is None
+    assert cache.get('quote') is None
+    assert breaker.is_open
+    assert cache.get('quote') is None
+    assert upstream.hits == 2
+
+    upstream.status = 200
+    time.sleep(0.25)
+    assert cache.get('quote') == 3
+    assert not breaker.is_open
+    assert breaker.failures == 0
+
+
+def test_cold_read_gives_up_at_deadline(cache, fetch, upstream):
+    cache.register('quote', fetch, ttl=60, max_stale=0, deadline=0.1)
+    upstream.delay = 0.5
+
+    started = time.monotonic()
+    assert cache.get('quote') is None
+    assert time.monotonic() - started < 0.4
+
+    # The fetch keeps running and fills the cache for later readers
+    wait_for(lambda: cache.get('quote') == 1)
+    assert upstream.hits == 1
+
+
+def test_slow_source_does_not_hold_back_others(cache, fetch, upstream):
+    def fast():
+        return 'fast'
+
+    cache.register('slow', fetch, ttl=60, max_stale=0, deadline=0.1)
+    cache.register('fast', fast, ttl=60, max_stale=0, deadline=1)
+    upstream.delay = 0.5
+
+    started = time.monotonic()
+    assert cache.get_many(['slow', 'fast']) == {'slow': None, 'fast': 'fast'}
+    assert time.monotonic() - started < 0.4
@@ -0,0 +1,114 @@
+"""Exactly-once handling of WhatsApp messages across retries and restarts.
+
+MessageLedger keeps a message from being queued twice; applied_messages in
+FinancialProcessor keeps a replayed command from being recorded twice.
+"""
+import pytest
+
+from src.bot.financial_processor import FinancialProcessor
+from src.bot.message_ledger import MessageLedger
+
+
+@pytest.fixture
+def ledger_path(tmp_path):
+    return str(tmp_path / 'ledger.db')
+
+
+@pytest.fixture
+def ledger(ledger_path):
+    ledger = MessageLedger(ledger_path)
+    yield ledger
+    ledger.close()
+
+
+@pytest.fixture
+def processor(tmp_path):
+    processor = FinancialProcessor(str(tmp_path / 'financial.db'))
+    yield processor
+    processor.close()
+
+
+def test_claim_returns_a_key_once(ledger):
+    key = ledger.claim('628111@c.us', 'msg-1', 'saldo')
+
+    assert key == MessageLedger.message_key('628111@c.us', 'msg-1')
+    assert ledger.claim('628111@c.us', 'msg-1', 'saldo') is None
+    # The same message id in another chat is a different message
+    assert ledger.claim('628222@c.us', 'msg-1', 'saldo') is not None
+
+
+def test_claim_is_remembered_across_restarts(ledger_path):
+    first = MessageLedger(ledger_path)
+    assert first.claim('628111@c.us', 'msg-1', 'saldo') is not None
+    first.close()
+
+    second = MessageLedger(ledger_path)
+    try:
+        assert second.claim('628111@c.us', 'msg-1', 'saldo') is None
+    finally:
+        second.close()
+
+
+def test_claim_is_remembered_after_lru_eviction(ledger_path):
+    ledger = MessageLedger(ledger_path, cache_size=1)
+    try:
+        ledger.claim('628111@c.us', 'msg-1', 'saldo')
+        ledger.claim('628111@c.us', 'msg-2', 'saldo')
+
+        assert ledger.claim('628111@c.us', 'msg-1', 'saldo') is None
+    finally:
+        ledger.close()
+
+
+def test_unfinished_returns_pending_and_handled_messages(ledger_path):
+    ledger = MessageLedger(ledger_path)
+    pending = ledger.claim('120363@g.us', 'msg-1', 'pengeluaran 5000 makan', sender='628111@c.us', in_group=True)
+    handled = ledger.claim('628222@c.us', 'msg-2', 'saldo')
+    replied = ledger.claim('628222@c.us', 'msg-3', 'laporan')
+    ledger.mark_handled(handled, 'Saldo: Rp 0')
+    ledger.mark_handled(replied, 'Laporan')
+    ledger.mark_replied(replied)
+    ledger.close()
+
+    recovered = MessageLedger(ledger_path)
+    try:
+        entries = {entry['key']: entry for entry in recovered.unfinished()}
+    finally:
+        recovered.close()
+
+    assert set(entries) == {pending, handled}
+    assert entries[pending]['status'] == 'pending'
+    assert entries[pending]['message'] == 'pengeluaran 5000 makan'
+    assert entries[pending]['sender'] == '628111@c.us'
+    assert entries[pending]['in_group'] is True
+    assert entries[handled]['status'] == 'handled'
+    assert entries[handled]['reply'] == 'Saldo: Rp 0'
+    assert entries[handled]['in_group'] is False
+
+
+def test_replayed_transaction_is_recorded_once(ledger, processor):
+    key = ledger.claim('628111@c.us', 'msg-1', 'pengeluaran 5000 makan')
+
+    assert processor.add_transaction(1, 5000, 'makan', 'expense', message_key=key)
+    # A crash before mark_handled hands the same message back to the handler
+    assert processor.add_transaction(1, 5000, 'makan', 'expense', message_key=key)
+
+    assert processor.get_balance(1) == -5000
+    count = processor._get_connection().execute('SELECT COUNT(*) FROM transactions').fetchone()[0]
+    assert count == 1
+
+
+def test_replayed_savings_goal_is_recorded_once(ledger, processor):
+    key = ledger.claim('628111@c.us', 'msg-1', 'target 1000000 laptop')
+
+    assert processor.add_savings_goal(1, 'laptop', 1000000, message_key=key)
+    assert processor.add_savings_goal(1, 'laptop', 1000000, message_key=key)
+
+    assert [goal['name'] for goal in processor.get_savings_goals(1)] == ['laptop']
+
+
+def test_commands_without_a_key_are_not_deduplicated(processor):
+    processor.add_transaction(1, 5000, 'makan', 'expense')
+    processor.add_transaction(1, 5000, 'makan', 'expense')
+
+    assert processor.get_balance(1) == -10000
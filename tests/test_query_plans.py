@@ -0,0 +1,42 @@
+"""Query-plan checks for the statements FinancialProcessor runs.
+
+A missing index turns these per-user lookups into full table scans, which
+only shows up as slowness on large databases; EXPLAIN QUERY PLAN catches
+it on an empty one.
+"""
+import pytest
+
+from src.bot.financial_processor import (BALANCE_SQL, MONTHLY_ROLLUP_SQL, MONTHLY_SUMMARY_SQL, SUMMARY_SQL,
+                                         FinancialProcessor)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    processor = FinancialProcessor(str(tmp_path / 'financial.db'))
+    yield processor._get_connection()
+    processor.close()
+
+
+def query_plan(conn, sql, params):
+    return [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+@pytest.mark.parametrize('sql, params', [
+    (SUMMARY_SQL.format(table='transactions'), ('2024-05-01', '2024-06-01', '2024-05-01', '2024-06-01', 1)),
+    (MONTHLY_SUMMARY_SQL.format(table='transactions'), (1, '2024-05-01', '2024-06-01')),
+], ids=['summary', 'monthly_summary'])
+def test_summaries_search_a_user_index(conn, sql, params):
+    plan = query_plan(conn, sql, params)
+    assert any(step.startswith('SEARCH transactions USING INDEX idx_transactions_user_') and '(user_id=?' in step
+               for step in plan), plan
+    assert not any(step.startswith('SCAN transactions') for step in plan), plan
+
+
+def test_monthly_rollup_read_is_a_primary_key_lookup(conn):
+    plan = query_plan(conn, MONTHLY_ROLLUP_SQL, (1, 2024, 5))
+    assert plan == ['SEARCH monthly_rollups USING PRIMARY KEY (user_id=? AND year=? AND month=?)']
+
+
+def test_balance_read_is_a_primary_key_lookup(conn):
+    plan = query_plan(conn, BALANCE_SQL, (1,))
+    assert plan == ['SEARCH user_balances USING INTEGER PRIMARY KEY (rowid=?)']
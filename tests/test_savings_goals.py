@@ -0,0 +1,69 @@
+"""Savings goal reads stay current when another connection writes.
+
+get_savings_goals caches per user; these check that a write made through a
+different connection, as another worker thread or bot process would, is
+seen on the next read.
+"""
+import threading
+
+import pytest
+
+from src.bot.financial_processor import FinancialProcessor
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'financial.db')
+
+
+@pytest.fixture
+def processor(db_path):
+    processor = FinancialProcessor(db_path)
+    yield processor
+    processor.close()
+
+
+def amounts(processor, user_id):
+    return [goal['current_amount'] for goal in processor.get_savings_goals(user_id)]
+
+
+def test_write_from_another_process_is_seen(processor, db_path):
+    processor.add_savings_goal(1, 'laptop', 1000000)
+    assert amounts(processor, 1) == [0]
+
+    other = FinancialProcessor(db_path)
+    try:
+        other.add_transaction(1, 100000, 'gaji', 'income')
+    finally:
+        other.close()
+
+    assert amounts(processor, 1) == [100000 * FinancialProcessor.SAVINGS_ALLOCATION_RATE]
+
+
+def test_write_from_another_thread_is_seen(processor):
+    processor.add_savings_goal(1, 'laptop', 1000000)
+    assert amounts(processor, 1) == [0]
+
+    worker = threading.Thread(target=processor.add_transaction, args=(1, 100000, 'gaji', 'income'))
+    worker.start()
+    worker.join()
+
+    assert amounts(processor, 1) == [100000 * FinancialProcessor.SAVINGS_ALLOCATION_RATE]
+
+
+def test_own_write_invalidates_the_cache(processor):
+    processor.add_savings_goal(1, 'laptop', 1000000)
+    assert amounts(processor, 1) == [0]
+
+    processor.add_transaction(1, 100000, 'gaji', 'income')
+
+    assert amounts(processor, 1) == [100000 * FinancialProcessor.SAVINGS_ALLOCATION_RATE]
+
+
+def test_unchanged_goals_are_served_from_the_cache(processor):
+    processor.add_savings_goal(1, 'laptop', 1000000)
+    first = processor.get_savings_goals(1)
+    first[0]['name'] = 'changed by caller'
+
+    assert processor.get_savings_goals(1)[0]['name'] == 'laptop'
+    assert 1 in processor._goals_cache()